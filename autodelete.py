@@ -0,0 +1,47 @@
+# autodelete.py — черга автовидалення повідомлень (min-heap за часом видалення)
+import heapq, time
+from typing import Dict, List, Optional, Tuple
+
+class DeleteQueue:
+    """
+    Один heap на весь бот замість date-джоби на кожне повідомлення.
+    drain_due() віддає все, що вже «дозріло», згруповане по чатах.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int]] = []
+        self.dirty = False  # є зміни, яких ще немає у сховищі
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, chat_id: int, message_id: int, due_ts: float) -> None:
+        heapq.heappush(self._heap, (due_ts, chat_id, message_id))
+        self.dirty = True
+
+    def drain_due(self, now: Optional[float] = None) -> Dict[int, List[int]]:
+        now = time.time() if now is None else now
+        out: Dict[int, List[int]] = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, chat_id, message_id = heapq.heappop(self._heap)
+            out.setdefault(chat_id, []).append(message_id)
+        if out:
+            self.dirty = True
+        return out
+
+    def drop_chat(self, chat_id: int) -> int:
+        """Прибрати все заплановане для чату (він уже недосяжний); → скільки прибрано."""
+        n = len(self._heap)
+        self._heap = [e for e in self._heap if e[1] != chat_id]
+        if len(self._heap) != n:
+            heapq.heapify(self._heap)
+            self.dirty = True
+        return n - len(self._heap)
+
+    def dump(self) -> List[List[float]]:
+        return [list(e) for e in self._heap]
+
+    def load(self, entries) -> None:
+        self._heap = [(float(ts), int(cid), int(mid)) for ts, cid, mid in entries or ()]
+        heapq.heapify(self._heap)
+        self.dirty = False
@@ -0,0 +1,55 @@
+# bench/bench_broadcast.py — прогін Broadcaster проти фейкового Bot (без мережі)
+#   python bench/bench_broadcast.py [users] [latency_ms] [p429]
+import asyncio, random, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram.utils.exceptions import RetryAfter
+
+from broadcast import Broadcaster
+
+class FakeMessage:
+    __slots__ = ("chat_id", "message_id")
+
+    def __init__(self, chat_id: int, message_id: int):
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+class FakeBot:
+    """send_message із затримкою latency і ймовірністю p429 відповісти RetryAfter."""
+
+    def __init__(self, latency: float = 0.05, p429: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.p429 = p429
+        self.retry_after = retry_after
+        self.delivered = {}
+        self.calls = 0
+        self._seq = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.p429 and random.random() < self.p429:
+            raise RetryAfter(self.retry_after)
+        self._seq += 1
+        self.delivered[chat_id] = self.delivered.get(chat_id, 0) + 1
+        return FakeMessage(chat_id, self._seq)
+
+async def main(users: int, latency: float, p429: float):
+    fake = FakeBot(latency=latency, p429=p429)
+    # ліміт піднято, щоб міряти саме рушій, а не 25 msg/s Telegram
+    b = Broadcaster(fake, rate=1000, workers=64)
+    t0 = time.perf_counter()
+    stats = await b.broadcast(range(users), "⌛ test")
+    dt = time.perf_counter() - t0
+    lost = users - len(fake.delivered)
+    print(f"users={users} latency={latency*1000:.0f}ms p429={p429}")
+    print(f"  {stats!r}")
+    print(f"  api calls={fake.calls} lost={lost} wall={dt:.2f}s")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    lat = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    p = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    asyncio.run(main(n, lat, p))
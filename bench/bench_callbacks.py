@@ -0,0 +1,83 @@
+# bench/bench_callbacks.py — мікробенчмарк: кешовані клавіатури + таблиця маршрутів
+# проти старого шляху (нова InlineKeyboardMarkup на кожен callback + ланцюжок lambda-фільтрів)
+#   python bench/bench_callbacks.py [iterations]
+import os, sys, timeit
+from pathlib import Path
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH_TOKEN_abcdefghijklmnopqrstuvwx")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bot  # noqa: E402
+
+# callback_data у пропорціях типової навігації по розкладу
+STREAM = [
+    "sched:open", "sched:week:practical", "sched:day:practical:Вівторок",
+    "sched:view:practical:Вівторок:detail", "sched:view:practical:Вівторок:brief",
+    "sched:week:lecture", "sched:day:lecture:Середа", "home", "bells:open",
+    "settings:open", "settings:toggle:hour", "admin:download",
+]
+
+# старі фільтри в тому порядку, в якому їх перебирав aiogram
+OLD_FILTERS = [
+    lambda d: d == "home",
+    lambda d: d == "sched:open",
+    lambda d: d.startswith("sched:week:"),
+    lambda d: d.startswith("sched:day:"),
+    lambda d: d.startswith("sched:view:"),
+    lambda d: d == "bells:open",
+    lambda d: d == "settings:open",
+    lambda d: d.startswith("settings:toggle:"),
+    lambda d: d.startswith("admin:"),
+]
+
+def _keyboard_for(data: str, build):
+    parts = data.split(":")
+    if data == "sched:open":
+        return build["weeks"]()
+    if data.startswith("sched:week:"):
+        return build["days"](parts[2])
+    if data.startswith("sched:day:"):
+        return build["view"](parts[2], parts[3], False)
+    if data.startswith("sched:view:"):
+        return build["view"](parts[2], parts[3], parts[4] == "detail")
+    if data.startswith("settings:"):
+        return build["settings"]({"notify_hour_before": True}, {})
+    return build["main"]()
+
+OLD_BUILD = {
+    "main": bot.kb_main.__wrapped__,
+    "weeks": bot.kb_sched_weeks.__wrapped__,
+    "days": bot.kb_sched_days.__wrapped__,
+    "view": bot.kb_day_view.__wrapped__,
+    "settings": lambda u, g: bot._kb_settings.__wrapped__(bool(u.get("notify_hour_before")),
+                                                          bool(u.get("notify_5min_before"))),
+}
+NEW_BUILD = {
+    "main": bot.kb_main,
+    "weeks": bot.kb_sched_weeks,
+    "days": bot.kb_sched_days,
+    "view": bot.kb_day_view,
+    "settings": bot.kb_settings,
+}
+
+def old_path():
+    for d in STREAM:
+        for i, f in enumerate(OLD_FILTERS):
+            if f(d):
+                break
+        _keyboard_for(d, OLD_BUILD)
+
+def new_path():
+    for d in STREAM:
+        bot.resolve_callback(d)
+        _keyboard_for(d, NEW_BUILD)
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per = n * len(STREAM)
+    t_old = min(timeit.repeat(old_path, number=n, repeat=3))
+    t_new = min(timeit.repeat(new_path, number=n, repeat=3))
+    print(f"callbacks: {per}")
+    print(f"  old (fresh keyboards + lambda chain): {t_old / per * 1e6:8.2f} µs/update")
+    print(f"  new (cached keyboards + route table): {t_new / per * 1e6:8.2f} µs/update")
+    print(f"  speedup: x{t_old / t_new:.1f}")
@@ -0,0 +1,54 @@
+# bench/bench_search.py — inline-пошук на синтетичному «великому факультеті»
+#   python bench/bench_search.py [groups] [iterations]
+import random, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search import SearchIndex, normalize  # noqa: E402
+from timetable import ScheduleIndex, WEEK_KEYS  # noqa: E402
+
+SUBJECTS = ["Стратегічний маркетинг", "Обʼєктно-орієнтоване програмування", "Бази даних", "Economics",
+            "Вища математика", "Філософія", "Англійська мова", "Менеджмент", "Статистика", "Право"]
+TEACHERS = ["Н. Басій", "А. Костенко", "О. Петренко", "І. Шевчук", "М. Коваль", "Д. Бондар"]
+BUILDINGS = ["М.", "Т.Б.", "Г.К."]
+STARTS = ["08:30", "10:05", "11:40", "13:15", "14:50"]
+
+def faculty(n_groups: int, rnd: random.Random):
+    groups = {}
+    for g in range(n_groups):
+        weeks = {}
+        for w in WEEK_KEYS:
+            weeks[w] = {str(d): [{"start": s, "title": rnd.choice(SUBJECTS), "teacher": rnd.choice(TEACHERS),
+                                  "room": f"{rnd.choice(BUILDINGS)} {rnd.randint(100, 599)}"}
+                                 for s in rnd.sample(STARTS, rnd.randint(1, 4))] for d in range(1, 6)}
+        groups[f"ГР-{g:03d}"] = weeks
+    return groups
+
+def main(n_groups: int = 300, iterations: int = 20000):
+    rnd = random.Random(1)
+    t0 = time.perf_counter()
+    index = ScheduleIndex({}, {}, faculty(n_groups, rnd))
+    t_index = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    search = SearchIndex(index)
+    t_search = time.perf_counter() - t0
+    print(f"{n_groups} groups, {len(search)} pairs: ScheduleIndex {t_index * 1000:.0f} ms, "
+          f"SearchIndex {t_search * 1000:.0f} ms, {len(search._prefixes)} prefixes, {len(search._trigrams)} trigrams")
+
+    queries = ["маркетинг", "басій", "м. 51", "гр-042 бази", "кетинг", "обєктно", "т.б", "zzz"]
+    for q in queries:
+        norm = normalize(q)
+        hits = search._search(norm)  # без кешу відповідей
+        t0 = time.perf_counter()
+        for _ in range(iterations // 10):
+            search._search(norm)
+        cold = (time.perf_counter() - t0) / (iterations // 10)
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            search.search(q)
+        warm = (time.perf_counter() - t0) / iterations
+        print(f"  {q!r:16} {len(hits):6} hits   index {cold * 1e6:8.1f} µs   cached {warm * 1e6:6.2f} µs")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
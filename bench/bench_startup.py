@@ -0,0 +1,94 @@
+# bench/bench_startup.py — холодний старт: імпорт, on_startup і час до першого апдейту
+#   python bench/bench_startup.py [--users 100000] [--runs 3]
+# Кожен прогін — окремий процес python (як рестарт з Procfile) проти фейкового Bot API.
+# Спершу старт без знімка (перебудова з JSON), далі — зі знімка, записаного при зупинці.
+import argparse, asyncio, json, os, random, shutil, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def child():
+    t0 = time.perf_counter()
+    sys.path.insert(0, str(ROOT))
+    import bot
+    t_import = time.perf_counter() - t0
+    from aiogram import Bot, types
+
+    async def run():
+        Bot.set_current(bot.bot)
+        t1 = time.perf_counter()
+        await bot.on_startup(bot.dp)
+        t_startup = time.perf_counter() - t1
+        chat = {"id": 10_000_000, "type": "private"}
+        update = types.Update(**{"update_id": 1, "message": {
+            "message_id": 1, "date": int(time.time()), "chat": chat, "text": "/start",
+            "from": {"id": chat["id"], "is_bot": False, "first_name": "u"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}})
+        await bot.dp.process_update(update)
+        t_first = time.perf_counter() - t0
+        await bot.on_shutdown(bot.dp)
+        await (await bot.bot.get_session()).close()
+        return t_startup, t_first
+
+    t_startup, t_first = asyncio.run(run())
+    print(json.dumps({"import": t_import, "startup": t_startup, "first_update": t_first}), flush=True)
+
+async def spawn(env) -> dict:
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(sys.executable, __file__, "--child", env=env,
+                                                stdout=asyncio.subprocess.PIPE)
+    out, _ = await proc.communicate()
+    wall = time.perf_counter() - t0
+    res = json.loads(out.decode().strip().splitlines()[-1])
+    res["process"] = wall
+    return res
+
+def report(label: str, runs):
+    keys = ("import", "startup", "first_update", "process")
+    best = {k: min(r[k] for r in runs) for k in keys}
+    print(f"{label:9} import {best['import'] * 1000:7.0f} ms   on_startup {best['startup'] * 1000:7.0f} ms   "
+          f"first update {best['first_update'] * 1000:7.0f} ms   whole process {best['process'] * 1000:7.0f} ms")
+
+async def main(args):
+    sys.path.insert(0, str(ROOT / "bench"))
+    from fake_bot_api import FakeBotAPI
+
+    tmp = Path(tempfile.mkdtemp(prefix="tgbot-start-"))
+    shutil.copytree(ROOT / "data", tmp / "data")
+    rnd = random.Random(1)
+    groups = list(json.loads((ROOT / "schedule.json").read_text(encoding="utf-8")).get("groups", {}))
+    users = {}
+    for i in range(args.users):
+        u = {"notify_hour_before": rnd.random() < 0.6, "notify_5min_before": rnd.random() < 0.8}
+        if groups and rnd.random() < 0.7:
+            u["group"] = rnd.choice(groups)
+        users[str(10_000_000 + i)] = u
+    (tmp / "data" / "users.json").write_text(json.dumps(users), encoding="utf-8")
+
+    api = FakeBotAPI()
+    env = dict(os.environ, BOT_TOKEN="123456:BENCH_TOKEN_abcdefghijklmnopqrstuvwx", BOT_API_SERVER=await api.start(),
+               DATA_DIR=str(tmp / "data"), SCHEDULE_FILE=str(ROOT / "schedule.json"), METRICS_PORT="0")
+    snapshot = tmp / "data" / "snapshot.bin"
+    try:
+        print(f"{args.users} users")
+        cold = []
+        for _ in range(args.runs):
+            snapshot.unlink(missing_ok=True)
+            cold.append(await spawn(env))
+        report("rebuild", cold)
+        print(f"snapshot  {snapshot.stat().st_size / 2 ** 20:.1f} MB")
+        report("snapshot", [await spawn(env) for _ in range(args.runs)])
+        off = dict(env, SNAPSHOT_FILE="")
+        report("disabled", [await spawn(off) for _ in range(args.runs)])
+    finally:
+        await api.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        ap = argparse.ArgumentParser()
+        ap.add_argument("--users", type=int, default=100_000)
+        ap.add_argument("--runs", type=int, default=3)
+        asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,74 @@
+# bench/fake_bot_api.py — фейковий Bot API сервер в тому ж процесі (aiohttp, без мережі назовні)
+#   server = FakeBotAPI(latency=0.0, p429=0.0); url = await server.start()
+#   BOT_API_SERVER=url → bot.py ходить сюди замість api.telegram.org
+import asyncio, random, time
+from collections import Counter
+from typing import Any, Dict
+
+from aiohttp import web
+
+TRUE_METHODS = {
+    "answerCallbackQuery", "deleteMessage", "deleteMessages", "setWebhook",
+    "deleteWebhook", "setMyCommands", "sendChatAction",
+}
+
+class FakeBotAPI:
+    """
+    POST /bot{token}/{method}: sendMessage/editMessageText/sendDocument віддають
+    правдоподібний Message, решта — true. latency — затримка на кожен виклик,
+    p429 — частка відповідей 429 з retry_after.
+    """
+
+    def __init__(self, latency: float = 0.0, p429: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.p429 = p429
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self._seq = 0
+        self._runner = None
+
+    def _message(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._seq += 1
+        chat_id = int(data.get("chat_id") or 0)
+        return {
+            "message_id": int(data.get("message_id") or self._seq),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": data.get("text", ""),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        data = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.p429 and method == "sendMessage" and random.random() < self.p429:
+            self.calls["429"] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            result: Any = self._message(data)
+        elif method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
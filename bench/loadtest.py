@@ -0,0 +1,172 @@
+# bench/loadtest.py — навантажувальний прогін справжнього dp проти фейкового Bot API
+#   python bench/loadtest.py [--browse 20000] [--browse-users 1000] [--peaks 1000,10000,100000]
+#                            [--concurrency 200] [--latency-ms 0] [--p429 0]
+# Працює офлайн: дані — копія data/ у тимчасовій теці, Bot API — aiohttp у цьому ж процесі.
+import argparse, asyncio, gc, json, os, random, resource, shutil, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+
+TMP = Path(tempfile.mkdtemp(prefix="tgbot-load-"))
+shutil.copytree(ROOT / "data", TMP / "data")
+if (ROOT / "schedule.json").exists():
+    shutil.copy(ROOT / "schedule.json", TMP / "schedule.json")
+
+DAYS = ["Понеділок", "Вівторок", "Середа", "Четвер", "Пʼятниця"]
+WEEKS = ["practical", "lecture"]
+
+def rss_mb() -> float:
+    # поточний RSS із /proc (Linux); пік — через getrusage
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return float("nan")
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def pct(values, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+# ── СИНТЕТИЧНІ АПДЕЙТИ ──────────────────────────────────────────────────────
+def browse_action(rnd: random.Random) -> str:
+    w, d = rnd.choice(WEEKS), rnd.choice(DAYS)
+    return rnd.choices(
+        ["home", "sched:open", f"sched:week:{w}", f"sched:day:{w}:{d}",
+         f"sched:view:{w}:{d}:{rnd.choice(['brief', 'detail'])}", "bells:open",
+         "settings:open", f"settings:toggle:{rnd.choice(['hour', '5min'])}", "/start"],
+        weights=[8, 10, 14, 20, 14, 6, 8, 16, 4],
+    )[0]
+
+def make_update(update_id: int, chat_id: int, action: str) -> dict:
+    user = {"id": chat_id, "is_bot": False, "first_name": "u"}
+    chat = {"id": chat_id, "type": "private"}
+    if action.startswith("/"):
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "chat": chat, "from": user,
+            "text": action, "entities": [{"type": "bot_command", "offset": 0, "length": len(action)}]}}
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": user, "chat_instance": str(chat_id), "data": action,
+        "message": {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "x"}}}
+
+def write_users(n: int, groups, rnd: random.Random, base: int = 10_000_000) -> None:
+    users = {}
+    for i in range(n):
+        u = {"notify_hour_before": rnd.random() < 0.6, "notify_5min_before": rnd.random() < 0.8}
+        if groups and rnd.random() < 0.7:
+            u["group"] = rnd.choice(groups)
+        users[str(base + i)] = u
+    (TMP / "data" / "users.json").write_text(json.dumps(users), encoding="utf-8")
+
+def reset_users(bot) -> float:
+    # змусити бот перечитати users.json, як після рестарту
+    bot.USERS.clear()
+    bot._USERS_LOADED = False
+    bot._USERS_DIRTY.clear()
+    t0 = time.perf_counter()
+    bot.load_users()
+    return time.perf_counter() - t0
+
+# ── СЦЕНАРІЇ ────────────────────────────────────────────────────────────────
+async def run_browse(bot, types, n_updates: int, n_users: int, concurrency: int, rnd: random.Random):
+    write_users(n_users, bot.INDEX.groups, rnd)
+    reset_users(bot)
+    updates = [types.Update(**make_update(i, 10_000_000 + rnd.randrange(n_users), browse_action(rnd)))
+               for i in range(n_updates)]
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(u):
+        async with sem:
+            t0 = time.perf_counter()
+            await bot.dp.process_update(u)
+            latencies.append(time.perf_counter() - t0)
+
+    gc.collect()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(u) for u in updates))
+    wall = time.perf_counter() - t0
+    print(f"browse: {n_updates} updates / {n_users} users, concurrency {concurrency}")
+    print(f"  throughput {n_updates / wall:8.0f} upd/s   wall {wall:.2f}s")
+    print(f"  latency p50 {pct(latencies, 0.5) * 1000:7.2f} ms   p99 {pct(latencies, 0.99) * 1000:7.2f} ms")
+
+async def run_peak(bot, n_users: int, rnd: random.Random):
+    write_users(n_users, bot.INDEX.groups, rnd)
+    gc.collect()
+    rss0 = rss_mb()
+    t_load = reset_users(bot)
+    t0 = time.perf_counter()
+    bot.replan_all()
+    t_replan = time.perf_counter() - t0
+    rss1 = rss_mb()
+
+    # пік — «за 5 хв до першої пари» одночасно для всіх груп, незалежно від поточного часу
+    week = bot.load_global().get("week", "practical")
+    day = max(DAYS, key=lambda d: len(bot.INDEX.day(week, d).pairs))
+    entries = tuple((g, "5min", (bot.INDEX.day(week, day, g).first_pair or 1))
+                    for g in (bot.DEFAULT_GROUP,) + bot.INDEX.groups)
+    targets = sum(len(bot.SUBSCRIBERS.get((g, k), ())) for g, k, _ in entries)
+    queued0 = len(bot.DELETE_QUEUE)
+    t0 = time.perf_counter()
+    await bot._fire_slot("bench:peak", week, day, entries)
+    t_fire = time.perf_counter() - t0
+    sent = len(bot.DELETE_QUEUE) - queued0
+
+    print(f"peak: {n_users} users")
+    print(f"  load users {t_load * 1000:8.1f} ms   replan {t_replan * 1000:8.1f} ms   jobs {len(bot.scheduler.get_jobs())}"
+          f"   calendar slots {len(bot.CALENDAR)}")
+    print(f"  fire {targets} reminders: {t_fire:6.2f}s  ({sent / t_fire if t_fire else 0:8.0f} msg/s, sent {sent})")
+    print(f"  rss {rss1:7.1f} MB (users +{rss1 - rss0:.1f} MB)   peak rss {peak_rss_mb():7.1f} MB")
+
+async def main(args):
+    api = FakeBotAPI(latency=args.latency_ms / 1000, p429=args.p429)
+    url = await api.start()
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCH_TOKEN_abcdefghijklmnopqrstuvwx")
+    os.environ["BOT_API_SERVER"] = url
+    os.environ["DATA_DIR"] = str(TMP / "data")
+    os.environ["SCHEDULE_FILE"] = str(TMP / "schedule.json")
+    os.environ["METRICS_PORT"] = "0"
+    os.environ["USERS_FLUSH_DELAY"] = "3600"  # не міряємо запис users.json у фоні
+    os.environ.setdefault("THROTTLE_RATE", "0")  # синтетичні юзери — не флудери
+    os.environ.setdefault("BROADCAST_RATE", str(args.rate))
+    os.environ.setdefault("BROADCAST_WORKERS", str(args.workers))
+
+    from aiogram import Bot, types
+    import bot
+
+    Bot.set_current(bot.bot)
+    bot.reload_cache(force=True)
+    rnd = random.Random(args.seed)
+    try:
+        if args.browse:
+            await run_browse(bot, types, args.browse, args.browse_users, args.concurrency, rnd)
+        for n in args.peaks:
+            await run_peak(bot, n, rnd)
+        print(f"api calls: {dict(api.calls.most_common())}")
+        print(f"scheduler jobs: {len(bot.scheduler.get_jobs())}   autodelete backlog: {len(bot.DELETE_QUEUE)}")
+    finally:
+        await (await bot.bot.get_session()).close()
+        await api.stop()
+        bot.IO_EXECUTOR.shutdown(wait=True)
+        shutil.rmtree(TMP, ignore_errors=True)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--browse", type=int, default=20000, help="скільки апдейтів навігації програти (0 — пропустити)")
+    ap.add_argument("--browse-users", type=int, default=1000)
+    ap.add_argument("--peaks", type=lambda v: [int(x) for x in v.split(",") if x], default=[1000, 10000, 100000])
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="затримка фейкового Bot API")
+    ap.add_argument("--p429", type=float, default=0.0, help="частка відповідей 429 на sendMessage")
+    ap.add_argument("--rate", type=float, default=1e6, help="BROADCAST_RATE: за замовчуванням без ліміту, міряємо сам бот")
+    ap.add_argument("--workers", type=int, default=64, help="BROADCAST_WORKERS")
+    ap.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(ap.parse_args()))
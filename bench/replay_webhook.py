@@ -0,0 +1,56 @@
+# bench/replay_webhook.py — програти записані апдейти через webhook-застосунок бота
+#   python bench/replay_webhook.py bench/updates/*.json
+# Бот працює з копією data/ у тимчасовій теці; Bot API підмінено — мережа не потрібна.
+import asyncio, json, os, shutil, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TMP = Path(tempfile.mkdtemp(prefix="tgbot-replay-"))
+shutil.copytree(ROOT / "data", TMP / "data")
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH_TOKEN_abcdefghijklmnopqrstuvwx")
+os.environ.setdefault("WEBHOOK_SECRET", "replay-secret")
+os.environ["DATA_DIR"] = str(TMP / "data")
+sys.path.insert(0, str(ROOT))
+
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+import bot  # noqa: E402
+
+CALLS = []
+
+async def fake_request(method, data=None, files=None, **kwargs):
+    CALLS.append((method, data or {}))
+    chat_id = int((data or {}).get("chat_id", 0) or 0)
+    if method in ("sendMessage", "editMessageText"):
+        return {"message_id": len(CALLS), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": (data or {}).get("text", "")}
+    return True
+
+async def main(paths):
+    bot.bot.request = fake_request
+    bot.reload_cache()
+    bot.load_users()
+    client = TestClient(TestServer(bot.build_web_app()))
+    await client.start_server()
+    try:
+        r = await client.get("/healthz")
+        print("GET /healthz", r.status, await r.json())
+        r = await client.post(bot.WEBHOOK_PATH, json={"update_id": 1})
+        print("POST without secret header", r.status)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": bot.WEBHOOK_SECRET}
+        for p in paths:
+            update = json.loads(Path(p).read_text(encoding="utf-8"))
+            n = len(CALLS)
+            t0 = time.perf_counter()
+            r = await client.post(bot.WEBHOOK_PATH, json=update, headers=headers)
+            dt = (time.perf_counter() - t0) * 1000
+            methods = [m for m, _ in CALLS[n:]]
+            print(f"POST {Path(p).name}: {r.status} {dt:.1f}ms -> {methods}")
+    finally:
+        await client.close()
+        bot.flush_users()
+        shutil.rmtree(TMP, ignore_errors=True)
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or sorted(str(p) for p in (ROOT / "bench" / "updates").glob("*.json"))
+    asyncio.run(main(files))
@@ -1,56 +1,324 @@
 # bot.py — персональні нагадування + глобальний тиждень + автознищення повідомлень
-import os, json, re
-from datetime import datetime, timedelta
+import os, io, json, time, asyncio, logging
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Awaitable, Callable, FrozenSet, List, Optional, Set, Tuple
 
 from aiogram import Bot, Dispatcher, types
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, InputFile
+from aiogram.bot.api import TELEGRAM_PRODUCTION, TelegramAPIServer
+from aiogram.types import (InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, InputFile,
+                           InlineQueryResultArticle, InputTextMessageContent)
 from aiogram.utils import executor
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from apscheduler.events import (EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED,
+                                EVENT_JOB_REMOVED, EVENT_JOB_SUBMITTED)
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
 import pytz
 
+from autodelete import DeleteQueue
+from broadcast import Broadcaster, DeadChats
+from editcache import EditCache
+from metrics import Registry, serve_metrics
+from overrides import OverrideIndex
+from search import SearchIndex
+from snapshot import code_fingerprint, read_snapshot, write_snapshot
+from storage import SCHEDULE_KINDS, file_version, open_storage, read_json, read_legacy_state
+from throttle import ChatRateLimiter, Coalescer
+from timetable import (DEFAULT_GROUP, CalendarSlot, DayIndex, ScheduleIndex, SlotEntry, UA_DAYS,
+                       materialize_calendar, week_label)
+
 # ── ENV ──────────────────────────────────────────────────────────────────────
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
 TZ_NAME = os.getenv("TZ", "Europe/Kyiv")
 AUTODELETE_MINUTES = int(os.getenv("AUTODELETE_MINUTES", "10"))
+AUTODELETE_TICK = int(os.getenv("AUTODELETE_TICK", "15"))          # сек між проходами черги
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))        # повідомлень/с на весь бот
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "16"))
+# після скількох постійних збоїв поспіль (заблокував бота, акаунт видалено) чат вимикається з розсилки
+DEAD_CHAT_THRESHOLD = int(os.getenv("DEAD_CHAT_THRESHOLD", "3"))
+# сек: нагадування, яке запізнилося більше (простій, падіння воркера), уже не розсилаємо
+REMINDER_GRACE = int(os.getenv("REMINDER_GRACE", "300"))
+# флуд з одного чату: апдейтів/с і запас; THROTTLE_RATE=0 вимикає
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "3"))
+THROTTLE_BURST = float(os.getenv("THROTTLE_BURST", "8"))
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "1.0"))     # сек, повтори перемикача зливаються
+# inline-пошук (@bot запит): результатів на сторінку (≤ 50) і скільки Telegram кешує відповідь
+INLINE_PAGE = min(50, int(os.getenv("INLINE_PAGE", "20")))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+# власний Bot API сервер (telegram-bot-api) або фейковий для навантажувальних тестів
+BOT_API_SERVER = os.getenv("BOT_API_SERVER", "")
+
+# BOT_MODE=polling (за замовчуванням) або webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "")          # https://bot.example.com
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")      # A-Z a-z 0-9 _ -
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("PORT", os.getenv("WEBAPP_PORT", "8080")))
+# /metrics — лише локально; METRICS_PORT=0 вимикає
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
 
 if not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN is not set")
+if BOT_MODE == "webhook" and not (WEBHOOK_HOST and WEBHOOK_SECRET):
+    raise RuntimeError("WEBHOOK_HOST and WEBHOOK_SECRET are required for BOT_MODE=webhook")
 TZ = pytz.timezone(TZ_NAME)
 
-bot = Bot(token=BOT_TOKEN, parse_mode="HTML")
+API_SERVER = TelegramAPIServer.from_base(BOT_API_SERVER) if BOT_API_SERVER else TELEGRAM_PRODUCTION
+bot = Bot(token=BOT_TOKEN, parse_mode="HTML", server=API_SERVER)
 dp = Dispatcher(bot)
 scheduler = AsyncIOScheduler(timezone=TZ)
+log = logging.getLogger("bot")
+
+# ── METRICS ─────────────────────────────────────────────────────────────────
+METRICS = Registry()
+M_HANDLER_SECONDS = METRICS.histogram("bot_handler_seconds", "Update handling time by route", ["route"])
+M_HANDLER_ERRORS = METRICS.counter("bot_handler_errors_total", "Unhandled handler exceptions by route", ["route"])
+M_SEND_SECONDS = METRICS.histogram("bot_send_seconds", "sendMessage call time by outcome", ["outcome"])
+M_REMINDERS = METRICS.counter("bot_reminders_total", "Reminders by kind and outcome", ["kind", "outcome"])
+M_JOB_LAG = METRICS.histogram("bot_scheduler_lag_seconds", "Job start minus scheduled run time", ["job"])
+M_JOB_EVENTS = METRICS.counter("bot_scheduler_events_total", "Job runs by outcome", ["job", "event"])
+M_IO_SECONDS = METRICS.histogram("bot_io_seconds", "Storage I/O time by operation", ["op"])
+M_ERRORS = METRICS.counter("bot_errors_total", "Swallowed exceptions by place", ["where"])
+M_EDIT_CACHE = METRICS.counter("bot_edit_cache_total", "safe_edit calls answered from the edit cache or sent", ["result"])
+M_THROTTLED = METRICS.counter("bot_throttled_total", "Updates dropped by the per-chat limiter or merged into a pending toggle", ["reason"])
+M_WORKER_RESTARTS = METRICS.counter("bot_worker_restarts_total", "Reminder worker processes respawned after exiting", ["shard"])
+M_PRUNED = METRICS.counter("bot_chats_pruned_total", "Chats switched off after permanent delivery failures", ["reason"])
+METRICS.gauge("bot_jobs", "Scheduled jobs", lambda: len(scheduler.get_jobs()))
+METRICS.gauge("bot_autodelete_backlog", "Messages waiting for auto-delete", lambda: len(DELETE_QUEUE))
+METRICS.gauge("bot_users", "Registered users", lambda: len(USERS))
+METRICS.gauge("bot_calendar_slots", "Materialised reminder slots ahead", lambda: len(CALENDAR))
+M_STARTUP = METRICS.gauge("bot_startup_seconds", "on_startup duration, from snapshot or full rebuild")
+METRICS_RUNNER = None
+
+def _job_label(job_id: str) -> str:
+    # без chat_id і часу в мітках — інакше кардинальність росте з кожним юзером
+    if job_id.startswith("test:"):
+        return "test"
+    return job_id
+
+def _on_job_submitted(event):
+    now = datetime.now(TZ)
+    for run_time in event.scheduled_run_times:
+        M_JOB_LAG.observe(max((now - run_time).total_seconds(), 0.0), job=_job_label(event.job_id))
+
+_JOB_EVENT_NAMES = {EVENT_JOB_EXECUTED: "executed", EVENT_JOB_ERROR: "error", EVENT_JOB_MISSED: "missed"}
+
+def _on_job_done(event):
+    M_JOB_EVENTS.inc(job=_job_label(event.job_id), event=_JOB_EVENT_NAMES[event.code])
+
+scheduler.add_listener(_on_job_submitted, EVENT_JOB_SUBMITTED)
+scheduler.add_listener(_on_job_done, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+
+def _on_send_result(outcome: str, seconds: float):
+    M_SEND_SECONDS.observe(seconds, outcome=outcome)
+
+DEAD_CHATS = DeadChats(DEAD_CHAT_THRESHOLD, lambda chat_id, reason: mark_chat_inactive(chat_id, reason))
+broadcaster = Broadcaster(bot, rate=BROADCAST_RATE, workers=BROADCAST_WORKERS, on_result=_on_send_result,
+                          dead=DEAD_CHATS)
+
+@lru_cache(maxsize=1)
+def _registered_commands() -> FrozenSet[str]:
+    # лише зареєстровані команди стають окремими мітками — довільні "/xyz" не плодять серій
+    cmds = set()
+    for h in dp.message_handlers.handlers:
+        for f in h.filters or ():
+            cmds.update(c.lower() for c in getattr(f.filter, "commands", None) or ())
+    return frozenset(cmds)
+
+def _update_route(update_obj) -> str:
+    if isinstance(update_obj, CallbackQuery):
+        parts = (update_obj.data or "").split(":")
+        for key in (":".join(parts[:2]), parts[0]):
+            if key in CALLBACK_ROUTES:
+                return key
+        return "callback:unknown"
+    if isinstance(update_obj, types.Message):
+        if update_obj.is_command():
+            cmd = (update_obj.get_command(pure=True) or "").lower()
+            return f"/{cmd}" if cmd in _registered_commands() else "/other"
+        return f"message:{update_obj.content_type}"
+    if isinstance(update_obj, types.InlineQuery):
+        return "inline"
+    return "other"
+
+class MetricsMiddleware(BaseMiddleware):
+    """Час обробки апдейту за маршрутом (префікс callback_data або команда)."""
+
+    async def on_pre_process_callback_query(self, c: CallbackQuery, data: dict):
+        data["_t0"] = time.perf_counter()
+
+    async def on_post_process_callback_query(self, c: CallbackQuery, results, data: dict):
+        M_HANDLER_SECONDS.observe(time.perf_counter() - data.get("_t0", time.perf_counter()), route=_update_route(c))
+
+    async def on_pre_process_message(self, m: types.Message, data: dict):
+        data["_t0"] = time.perf_counter()
+
+    async def on_post_process_message(self, m: types.Message, results, data: dict):
+        M_HANDLER_SECONDS.observe(time.perf_counter() - data.get("_t0", time.perf_counter()), route=_update_route(m))
+
+    async def on_pre_process_inline_query(self, q: types.InlineQuery, data: dict):
+        data["_t0"] = time.perf_counter()
+
+    async def on_post_process_inline_query(self, q: types.InlineQuery, results, data: dict):
+        M_HANDLER_SECONDS.observe(time.perf_counter() - data.get("_t0", time.perf_counter()), route="inline")
+
+dp.middleware.setup(MetricsMiddleware())
+
+# ── THROTTLE ────────────────────────────────────────────────────────────────
+# Зайве від одного чату не доходить до хендлерів: ні запису users.json, ні edit.
+THROTTLE = ChatRateLimiter(THROTTLE_RATE, THROTTLE_BURST)
+COALESCE_ROUTES = {"settings:toggle"}
+
+class ThrottleMiddleware(BaseMiddleware):
+    """Понад ліміт — лише порожній answerCallbackQuery; повтори перемикача — у TOGGLES."""
+
+    async def on_pre_process_callback_query(self, c: CallbackQuery, data: dict):
+        if c.from_user.id == ADMIN_ID:
+            return
+        chat_id = c.message.chat.id if c.message else c.from_user.id
+        if THROTTLE_RATE > 0 and not THROTTLE.allow(chat_id):
+            reason = "rate"
+        elif c.message and _update_route(c) in COALESCE_ROUTES and not TOGGLES.hit((chat_id, c.data), c):
+            reason = "coalesced"
+        else:
+            return
+        M_THROTTLED.inc(reason=reason)
+        await c.answer()
+        raise CancelHandler()
+
+    async def on_pre_process_message(self, m: types.Message, data: dict):
+        if THROTTLE_RATE > 0 and m.from_user and m.from_user.id != ADMIN_ID and not THROTTLE.allow(m.chat.id):
+            M_THROTTLED.inc(reason="rate")
+            raise CancelHandler()
+
+dp.middleware.setup(ThrottleMiddleware())
+
+@dp.errors_handler()
+async def on_handler_error(update: types.Update, exc: BaseException):
+    obj = update.callback_query or update.message or update.inline_query
+    M_HANDLER_ERRORS.inc(route=_update_route(obj))
+    log.error("update %s failed", update.update_id, exc_info=exc)
+    return True
+
+# ── JOB INDEX ───────────────────────────────────────────────────────────────
+# chat_id → id джоб цього юзера; тримаємо в синхроні з add_job/remove_job,
+# щоб прибрати джоби одного юзера без обходу scheduler.get_jobs().
+JOB_INDEX: Dict[int, Set[str]] = {}
+_JOB_OWNER: Dict[str, int] = {}
+
+def add_user_job(chat_id: int, func, trigger: str, job_id: str, **kwargs):
+    job = scheduler.add_job(func, trigger, id=job_id, replace_existing=True, **kwargs)
+    JOB_INDEX.setdefault(chat_id, set()).add(job_id)
+    _JOB_OWNER[job_id] = chat_id
+    return job
+
+def _forget_job(job_id: str):
+    owner = _JOB_OWNER.pop(job_id, None)
+    if owner is None:
+        return
+    ids = JOB_INDEX.get(owner)
+    if ids is not None:
+        ids.discard(job_id)
+        if not ids:
+            JOB_INDEX.pop(owner, None)
+
+def clear_user_jobs(chat_id: int, prefix: str = ""):
+    for job_id in list(JOB_INDEX.get(chat_id, ())):
+        if not job_id.startswith(prefix):
+            continue
+        try:
+            scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+        _forget_job(job_id)
+
+def _on_job_removed(event):
+    # date-джоби APScheduler прибирає сам після запуску — теж чистимо індекс
+    _forget_job(event.job_id)
+
+scheduler.add_listener(_on_job_removed, EVENT_JOB_REMOVED)
+
+def _rebuild_job_indexes():
+    # після старту з постійного сховища — відновити індекси з наявних джоб
+    for job in scheduler.get_jobs():
+        parts = job.id.split(":")
+        if parts[0] == "test" and len(parts) >= 2 and parts[1].lstrip("-").isdigit():
+            chat_id = int(parts[1])
+            JOB_INDEX.setdefault(chat_id, set()).add(job.id)
+            _JOB_OWNER[job.id] = chat_id
+        elif job.id.startswith(SLOT_PREFIX) or job.id == "global:replan_daily":
+            # джоби слотів і щонічного перепланування з часів до календаря
+            scheduler.remove_job(job.id)
 
 # ── AUTO-DELETE HELPERS ──────────────────────────────────────────────────────
-async def delete_message_safe(chat_id: int, message_id: int):
+# Замість date-джоби на кожне повідомлення — одна черга і одна періодична джоба,
+# яка раз на AUTODELETE_TICK секунд видаляє все, що дозріло.
+DELETE_QUEUE = DeleteQueue()
+DELETE_BATCH = 100  # максимум message_ids в одному deleteMessages
+
+async def delete_message_safe(chat_id: int, message_id: int) -> bool:
+    """False — чат недосяжний, решту його повідомлень видаляти марно."""
     try:
         await bot.delete_message(chat_id=chat_id, message_id=message_id)
+    except Exception as e:
+        M_ERRORS.inc(where="delete_message")
+        return not DEAD_CHATS.failed(chat_id, e)
+    return True
+
+async def _delete_chat_messages(chat_id: int, message_ids: List[int]):
+    for i in range(0, len(message_ids), DELETE_BATCH):
+        chunk = message_ids[i:i + DELETE_BATCH]
+        await broadcaster.bucket.acquire()
+        if len(chunk) > 1:
+            try:
+                await bot.request("deleteMessages", {"chat_id": chat_id, "message_ids": json.dumps(chunk)})
+                continue
+            except Exception as e:
+                M_ERRORS.inc(where="delete_batch")  # старий Bot API або частина вже видалена — поштучно нижче
+                if DEAD_CHATS.failed(chat_id, e):
+                    return
+        for mid in chunk:
+            if not await delete_message_safe(chat_id, mid):
+                return
+
+async def drain_autodelete():
+    due = DELETE_QUEUE.drain_due()
+    if due:
+        await asyncio.gather(*(_delete_chat_messages(cid, ids) for cid, ids in due.items()))
+    if DELETE_QUEUE.dirty:
+        entries = DELETE_QUEUE.dump()
+        DELETE_QUEUE.dirty = False
+        try:
+            await run_io(STORAGE.save_state, "autodelete", entries)
+        except Exception:
+            M_ERRORS.inc(where="autodelete_save")
+            DELETE_QUEUE.dirty = True
+
+def save_autodelete_queue():
+    try:
+        STORAGE.save_state("autodelete", DELETE_QUEUE.dump())
+        DELETE_QUEUE.dirty = False
     except Exception:
-        pass
+        M_ERRORS.inc(where="autodelete_save")
 
 def schedule_autodelete(chat_id: int, message_id: int, minutes: Optional[int] = None):
     if minutes is None:
         minutes = AUTODELETE_MINUTES
-    when = datetime.now(TZ) + timedelta(minutes=minutes)
-    try:
-        scheduler.add_job(
-            delete_message_safe, "date",
-            id=f"autodel:{chat_id}:{message_id}",
-            run_date=when, args=[chat_id, message_id],
-            misfire_grace_time=300, replace_existing=True
-        )
-    except Exception:
-        pass
+    DELETE_QUEUE.push(chat_id, message_id, datetime.now(TZ).timestamp() + minutes * 60)
 
 # ── PATHS ───────────────────────────────────────────────────────────────────
 BASE_DIR = Path(__file__).parent
-DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
+DATA_DIR = Path(os.getenv("DATA_DIR", str(BASE_DIR / "data")))
+DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 PRACTICAL_FILE = DATA_DIR / "practical.json"
 LECTURE_FILE   = DATA_DIR / "lecture.json"
@@ -59,163 +327,311 @@ BELLS_FILE     = DATA_DIR / "bells.json"
 LEGACY_STATE_FILE = DATA_DIR / "state.json"  # старий спільний файл
 GLOBAL_FILE = DATA_DIR / "global.json"
 USERS_FILE  = DATA_DIR / "users.json"
+# Багатогруповий розклад (groups → назва → practical/lecture → "1".."7" → [...]);
+# поки адмін не завантажив свій — беремо schedule.json з кореня репозиторію
+SCHEDULE_FILE = Path(os.getenv("SCHEDULE_FILE", str(BASE_DIR / "schedule.json")))
 
 # ── CACHE ───────────────────────────────────────────────────────────────────
-CACHE: Dict[str, Any] = {"practical": {}, "lecture": {}, "bells": {}}
-UPLOAD_WAIT: Dict[int, str] = {}  # {admin_id: "practical"|"lecture"|"bells"}
+CACHE: Dict[str, Any] = {"practical": {}, "lecture": {}, "bells": {}, "groups": {}, "overrides": {}}
+INDEX = ScheduleIndex({}, {})  # скомпільований розклад; міняється цілком у reload_cache
+SEARCH = SearchIndex(INDEX)    # inline-пошук по INDEX; перебудовується разом з ним
+OVERRIDES = OverrideIndex()    # винятки на дати; міняється окремо від INDEX
+UPLOAD_WAIT: Dict[int, str] = {}  # {admin_id: один з upload.UPLOAD_KINDS}
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024)))
+
+# ── STORAGE ─────────────────────────────────────────────────────────────────
+# STORAGE_BACKEND=json (за замовчуванням, data/*.json) або sqlite (data/bot.sqlite3, WAL)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")
+STORAGE_DB = Path(os.getenv("STORAGE_DB", str(DATA_DIR / "bot.sqlite3")))
+STORAGE = open_storage(STORAGE_BACKEND, DATA_DIR, STORAGE_DB)
+
+# JOBSTORE=memory (за замовчуванням) або sqlite — джоби (автовидалення, слоти)
+# переживають рестарт, а старт лише звіряє план із тим, що вже лежить у сховищі.
+JOBSTORE = os.getenv("JOBSTORE", "memory")
+JOBSTORE_DB = Path(os.getenv("JOBSTORE_DB", str(DATA_DIR / "jobs.sqlite3")))
+if JOBSTORE == "sqlite":
+    from jobstore import SQLiteJobStore
+    scheduler.add_jobstore(SQLiteJobStore(JOBSTORE_DB), "default")
+
+# ── ASYNC I/O ───────────────────────────────────────────────────────────────
+# Усі звернення до диска/SQLite з хендлерів ідуть через один фоновий потік:
+# event loop не чекає на fsync, а записи лишаються впорядкованими.
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="io")
+
+def _timed_io(func: Callable, *args):
+    t0 = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        M_IO_SECONDS.observe(time.perf_counter() - t0, op=getattr(func, "__name__", "io"))
+
+def run_io(func: Callable, *args) -> Awaitable:
+    return asyncio.get_running_loop().run_in_executor(IO_EXECUTOR, _timed_io, func, *args)
+
+def _log_io_error(fut) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        M_ERRORS.inc(where="background_write")
+        log.error("background write failed", exc_info=fut.exception())
+
+def submit_io(func: Callable, *args) -> None:
+    """Запис «вистрілив і забув»; поза event loop (старт, скрипти) — одразу."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        func(*args)
+        return
+    IO_EXECUTOR.submit(_timed_io, func, *args).add_done_callback(_log_io_error)
+
+# REMINDER_WORKERS=N>0 — розсилку нагадувань ведуть N окремих процесів, кожен
+# свій шард chat_id % N; фронт лише кладе завдання в локальну чергу (outbox).
+REMINDER_WORKERS = int(os.getenv("REMINDER_WORKERS", "0"))
+OUTBOX_DB = Path(os.getenv("OUTBOX_DB", str(DATA_DIR / "outbox.sqlite3")))
+OUTBOX = None
+WORKER_POOL = None
+if REMINDER_WORKERS > 0:
+    from outbox import Outbox, split_by_shard
+    from workers import WorkerPool
+    OUTBOX = Outbox(OUTBOX_DB)
+    WORKER_POOL = WorkerPool(REMINDER_WORKERS, OUTBOX_DB)
 
 # ── GLOBAL/USERS STATE ──────────────────────────────────────────────────────
 def default_global() -> Dict[str, Any]:
     return {"week": "practical", "auto_rotate": True}
 
+# Реєстр користувачів живе в памʼяті: читаємо сховище один раз,
+# а записи збираємо пачкою і скидаємо на диск із затримкою (write-behind).
+USERS: Dict[str, Dict[str, Any]] = {}
+_USERS_LOADED = False
+_USERS_DIRTY: Set[str] = set()
+_USERS_FULL_SYNC = False
+_USERS_FLUSH_HANDLE: Optional[asyncio.TimerHandle] = None
+USERS_FLUSH_DELAY = float(os.getenv("USERS_FLUSH_DELAY", "2"))
+
 def load_users() -> Dict[str, Any]:
-    if USERS_FILE.exists():
-        try:
-            d = json.loads(USERS_FILE.read_text(encoding="utf-8"))
-            return d if isinstance(d, dict) else {}
-        except Exception:
-            pass
-    return {}
+    global _USERS_LOADED
+    if not _USERS_LOADED:
+        USERS.clear()
+        USERS.update(STORAGE.load_users())
+        _USERS_LOADED = True
+    return USERS
+
+def _take_users_batch() -> Optional[Tuple[Dict[str, Any], Optional[Set[str]]]]:
+    # знімок реєстру + що писати; рядки USERS не мутуються, тож вистачає dict()
+    global _USERS_FULL_SYNC, _USERS_FLUSH_HANDLE
+    if _USERS_FLUSH_HANDLE is not None:
+        _USERS_FLUSH_HANDLE.cancel()
+        _USERS_FLUSH_HANDLE = None
+    if not _USERS_DIRTY and not _USERS_FULL_SYNC:
+        return None
+    dirty = None if _USERS_FULL_SYNC else set(_USERS_DIRTY)
+    _USERS_DIRTY.clear()
+    _USERS_FULL_SYNC = False
+    return dict(USERS), dirty
+
+def _restore_users_batch(dirty: Optional[Set[str]]) -> None:
+    global _USERS_FULL_SYNC
+    if dirty is None:
+        _USERS_FULL_SYNC = True
+    else:
+        _USERS_DIRTY.update(dirty)
+
+def flush_users() -> None:
+    batch = _take_users_batch()
+    if batch is None:
+        return
+    try:
+        STORAGE.save_users(*batch)
+    except Exception:
+        _restore_users_batch(batch[1])
+        raise
+
+async def flush_users_async() -> None:
+    batch = _take_users_batch()
+    if batch is None:
+        return
+    try:
+        await run_io(STORAGE.save_users, *batch)
+    except Exception:
+        log.exception("users flush failed")
+        _restore_users_batch(batch[1])
+        _schedule_users_flush()
+
+def _schedule_users_flush() -> None:
+    global _USERS_FLUSH_HANDLE
+    if _USERS_FLUSH_HANDLE is not None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_users()  # поза event loop (міграція, скрипти) — пишемо одразу
+        return
+    _USERS_FLUSH_HANDLE = loop.call_later(USERS_FLUSH_DELAY, lambda: asyncio.ensure_future(flush_users_async()))
+
+def _mark_users_dirty(chat_id: Optional[str] = None) -> None:
+    global _USERS_FULL_SYNC
+    if chat_id is None:
+        _USERS_FULL_SYNC = True
+    else:
+        _USERS_DIRTY.add(chat_id)
+    _schedule_users_flush()
 
 def save_users(all_users: Dict[str, Any]) -> None:
-    USERS_FILE.write_text(json.dumps(all_users, ensure_ascii=False, indent=2), encoding="utf-8")
+    users = load_users()
+    if all_users is not users:
+        users.clear()
+        users.update(all_users)
+    _mark_users_dirty()
 
 def default_user_state() -> Dict[str, Any]:
     return {"notify_hour_before": False, "notify_5min_before": False}
 
 def load_user(chat_id: int) -> Dict[str, Any]:
-    return load_users().get(str(chat_id), default_user_state())
+    return dict(load_users().get(str(chat_id)) or default_user_state())
 
 def save_user(chat_id: int, ustate: Dict[str, Any]) -> None:
     users = load_users()
-    users[str(chat_id)] = {
+    row = {
         "notify_hour_before": bool(ustate.get("notify_hour_before", False)),
         "notify_5min_before": bool(ustate.get("notify_5min_before", False)),
     }
-    save_users(users)
+    if ustate.get("group"):
+        row["group"] = str(ustate["group"])
+    if users.get(str(chat_id)) == row:
+        return
+    users[str(chat_id)] = row
+    _mark_users_dirty(str(chat_id))
+
+# Глобальний стан теж живе в памʼяті: читаємо раз, пишемо у фоні
+GLOBAL: Dict[str, Any] = {}
 
 def save_global(state: Dict[str, Any]) -> None:
-    GLOBAL_FILE.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    GLOBAL.clear()
+    GLOBAL.update(state)
+    submit_io(STORAGE.save_global, dict(state))
 
 def load_global() -> Dict[str, Any]:
+    if not GLOBAL:
+        GLOBAL.update(_read_global())
+    return dict(GLOBAL)
+
+def _read_global() -> Dict[str, Any]:
     # Міграція зі старого state.json (якщо присутній)
     if LEGACY_STATE_FILE.exists():
         try:
-            legacy = json.loads(LEGACY_STATE_FILE.read_text(encoding="utf-8"))
-            g = {
-                "week": legacy.get("week", "practical"),
-                "auto_rotate": legacy.get("auto_rotate", True),
-            }
-            save_global(g)
-            if legacy.get("chat_id") is not None:  # перенесемо старі прапорці одного юзера
-                u = load_users()
-                u[str(legacy["chat_id"])] = {
-                    "notify_hour_before": legacy.get("notify_hour_before", False),
-                    "notify_5min_before": legacy.get("notify_5min_before", False),
-                }
-                save_users(u)
+            legacy = read_legacy_state(LEGACY_STATE_FILE)
+            if legacy is not None:
+                g, legacy_users = legacy
+                STORAGE.save_global(g)
+                if legacy_users:  # перенесемо старі прапорці одного юзера
+                    u = load_users()
+                    u.update(legacy_users)
+                    save_users(u)
             try:
                 LEGACY_STATE_FILE.unlink()
             except Exception:
                 pass
         except Exception:
             pass
-    if GLOBAL_FILE.exists():
-        try:
-            d = json.loads(GLOBAL_FILE.read_text(encoding="utf-8"))
-            d.setdefault("week", "practical")
-            d.setdefault("auto_rotate", True)
-            return d
-        except Exception:
-            pass
+    d = STORAGE.load_global()
+    if d is not None:
+        d.setdefault("week", "practical")
+        d.setdefault("auto_rotate", True)
+        return d
     return default_global()
 
 # ── DATA LOADERS ────────────────────────────────────────────────────────────
-def load_json_file(p: Path) -> Any:
-    if not p.exists():
-        return {}
-    with p.open("r", encoding="utf-8") as f:
-        return json.load(f)
-
-def reload_cache() -> None:
-    CACHE["practical"] = load_json_file(PRACTICAL_FILE)
-    CACHE["lecture"]   = load_json_file(LECTURE_FILE)
-    CACHE["bells"]     = load_json_file(BELLS_FILE)
+# Версії джерел розкладу (mtime+розмір файлу або updated_at у SQLite):
+# незмінене не перечитуємо і не перебудовуємо індекс.
+CACHE_VERSIONS: Dict[str, Any] = {}
+CACHE_CHECK_SECONDS = int(os.getenv("CACHE_CHECK_SECONDS", "60"))
+
+def _schedule_versions() -> Dict[str, Any]:
+    v = {kind: STORAGE.schedule_version(kind) for kind in SCHEDULE_KINDS}
+    v["schedule.json"] = file_version(SCHEDULE_FILE)
+    return v
+
+def _read_changed_schedules(force: bool = False):
+    """Безпечно для IO-потоку: читає лише змінені розклади, стан не чіпає."""
+    versions = _schedule_versions()
+    if not force and versions == CACHE_VERSIONS:
+        return None
+    data = {}
+    for kind in ("practical", "lecture", "bells", "overrides"):
+        if force or versions[kind] != CACHE_VERSIONS.get(kind):
+            data[kind] = STORAGE.load_schedule(kind)
+    if force or versions["groups"] != CACHE_VERSIONS.get("groups") \
+            or versions["schedule.json"] != CACHE_VERSIONS.get("schedule.json"):
+        data["groups"] = STORAGE.load_schedule("groups") or read_json(SCHEDULE_FILE, {})
+    return versions, data
+
+def _apply_schedules(res) -> bool:
+    global INDEX, SEARCH, OVERRIDES
+    if res is None:
+        return False
+    versions, data = res
+    CACHE.update(data)
+    CACHE_VERSIONS.clear()
+    CACHE_VERSIONS.update(versions)
+    # змінились лише винятки — індекс розкладу і пошук лишаються ті самі
+    if data.keys() - {"overrides"}:
+        INDEX = ScheduleIndex(CACHE, CACHE["bells"], (CACHE["groups"] or {}).get("groups"))
+        SEARCH = SearchIndex(INDEX)
+    if "overrides" in data:
+        OVERRIDES = OverrideIndex(CACHE["overrides"])
+    _dated_day.cache_clear()
+    return True
+
+def reload_cache(force: bool = False) -> bool:
+    return _apply_schedules(_read_changed_schedules(force))
+
+async def refresh_cache(force: bool = False) -> bool:
+    return _apply_schedules(await run_io(_read_changed_schedules, force))
 
 # ── HELPERS ─────────────────────────────────────────────────────────────────
-PAIR_EMOJI = {1:"1️⃣",2:"2️⃣",3:"3️⃣",4:"4️⃣",5:"5️⃣",6:"6️⃣",7:"7️⃣",8:"8️⃣"}
-UA_DAYS = ["Понеділок","Вівторок","Середа","Четвер","Пʼятниця","Субота","Неділя"]
-
 def today_day_name(tz: pytz.timezone) -> str:
     now = datetime.now(tz)
     idx = (now.weekday() + 0) % 7  # 0=Mon
     return UA_DAYS[idx]
 
-def parse_bell_start(bell_val: str) -> Tuple[int,int]:
-    # "09:00-10:20" -> (9,0)
-    m = re.match(r"^\s*(\d{1,2}):(\d{2})\s*-\s*\d{1,2}:\d{2}\s*$", bell_val)
-    if not m:
-        raise ValueError(f"Bad bell time: {bell_val}")
-    return int(m.group(1)), int(m.group(2))
-
 def toggle_week_value(week_key: str) -> str:
     return "practical" if week_key == "lecture" else "lecture"
 
-def week_label(week_key: str) -> str:
-    return "Лекційний" if week_key == "lecture" else "Практичний"
-
-def _bell_range(pair_num: int) -> Optional[str]:
-    bells = CACHE.get("bells") or {}
-    return bells.get(str(pair_num))
-
-def _pair_text(week_key: str, day_name: str, pair_num: int) -> str:
-    items = (CACHE.get(week_key) or {}).get(day_name, [])
-    for it in items:
-        if int(it.get("pair", -1)) == int(pair_num):
-            subj = it.get("subject", "")
-            room = it.get("room", "")
-            teacher = it.get("teacher", "")
-            hours = _bell_range(pair_num) or ""
-            tstr = f"\n🕒 {hours}" if hours else ""
-            extra = f"\n👨‍🏫 {teacher}" if teacher else ""
-            rstr = f"\n🚪 {room}" if room else ""
-            return f"{PAIR_EMOJI.get(pair_num, str(pair_num))} <b>{subj}</b>{tstr}{rstr}{extra}"
-    return f"{PAIR_EMOJI.get(pair_num, str(pair_num))} Пара №{pair_num}"
+@lru_cache(maxsize=4096)
+def _dated_day(d: date, week_key: str, group: str = DEFAULT_GROUP) -> DayIndex:
+    # день на конкретну дату з винятками; кеш скидається в _apply_schedules
+    return OVERRIDES.day(INDEX, d, week_key, group)
+
+def _upcoming_date(week_key: str, day_name: str) -> Optional[date]:
+    """Найближча дата від сьогодні (у межах двох тижнів) з цим днем і типом тижня."""
+    today = datetime.now(TZ).date()
+    first = today + timedelta(days=(UA_DAYS.index(day_name) - today.weekday()) % 7)
+    g = load_global()
+    for d in (first, first + timedelta(days=7)):
+        if week_for_date(d, g) == week_key:
+            return d
+    return None
 
 # ── RENDERERS ───────────────────────────────────────────────────────────────
-def format_day(week_key: str, day_name: str, detailed: bool) -> str:
-    data = CACHE[week_key] or {}
-    pairs: List[Dict[str, Any]] = data.get(day_name, [])
-    head = f"📆 <b>{day_name}</b> • {week_label(week_key)} тиждень"
-    if not pairs:
-        return f"{head}\n— пар немає 🙂"
-    lines = [head]
-    for it in sorted(pairs, key=lambda x: int(x.get("pair", 0))):
-        p = int(it.get("pair", 0))
-        subj = it.get("subject", "")
-        room = it.get("room", "")
-        if detailed:
-            teacher = it.get("teacher", "")
-            hours = _bell_range(p)
-            time_str = f"\n🕒 {hours}" if hours else ""
-            lines.append(
-                f"{PAIR_EMOJI.get(p, str(p))} <b>{subj}</b>{time_str}\n"
-                f"🚪 {room}" + (f"\n👨‍🏫 {teacher}" if teacher else "")
-            )
-        else:
-            lines.append(f"{PAIR_EMOJI.get(p, str(p))} <b>{subj}</b> — {room}")
-    return "\n\n".join(lines)
+def format_day(week_key: str, day_name: str, detailed: bool, group: str = DEFAULT_GROUP) -> str:
+    on = _upcoming_date(week_key, day_name) if len(OVERRIDES) and day_name in UA_DAYS else None
+    d = _dated_day(on, week_key, group) if on else INDEX.day(week_key, day_name, group)
+    return d.detailed if detailed else d.brief
+
+def format_settings(g: Dict[str, Any], u: Dict[str, Any]) -> str:
+    group = user_group(u)
+    return (
+        "⚙️ <b>Налаштування</b>\n\n"
+        f"• Поточний тиждень: <b>{week_label(g.get('week','practical'))}</b>\n"
+        f"• Група: <b>{group or 'загальний розклад'}</b>\n"
+        "• Увімкніть потрібні нагадування:"
+    )
 
 def format_bells() -> str:
-    bells = CACHE.get("bells") or {}
-    if not bells:
-        return "🔔 Розклад дзвінків ще не завантажено."
-    lines = ["🔔 <b>Розклад дзвінків</b>"]
-    for k in sorted(bells.keys(), key=lambda x: int(x)):
-        lines.append(f"{PAIR_EMOJI.get(int(k), k)} {bells[k]}")
-    return "\n".join(lines)
+    return INDEX.bells_text
 
 # ── KEYBOARDS ───────────────────────────────────────────────────────────────
+# Клавіатури статичні для своїх параметрів — будуємо один раз і кешуємо.
+@lru_cache(maxsize=None)
 def kb_main() -> InlineKeyboardMarkup:
     kb = InlineKeyboardMarkup(row_width=1)
     kb.add(InlineKeyboardButton("📚 Розклад пар", callback_data="sched:open"))
@@ -223,6 +639,7 @@ def kb_main() -> InlineKeyboardMarkup:
     kb.add(InlineKeyboardButton("⚙️ Налаштування", callback_data="settings:open"))
     return kb
 
+@lru_cache(maxsize=None)
 def kb_sched_weeks() -> InlineKeyboardMarkup:
     kb = InlineKeyboardMarkup(row_width=2)
     kb.add(
@@ -232,6 +649,7 @@ def kb_sched_weeks() -> InlineKeyboardMarkup:
     kb.add(InlineKeyboardButton("🏠 В головне меню", callback_data="home"))
     return kb
 
+@lru_cache(maxsize=8)
 def kb_sched_days(week_key: str) -> InlineKeyboardMarkup:
     kb = InlineKeyboardMarkup(row_width=3)
     kb.row(
@@ -249,6 +667,7 @@ def kb_sched_days(week_key: str) -> InlineKeyboardMarkup:
     )
     return kb
 
+@lru_cache(maxsize=128)
 def kb_day_view(week_key: str, day_name: str, detailed: bool) -> InlineKeyboardMarkup:
     kb = InlineKeyboardMarkup(row_width=2)
     if detailed:
@@ -261,152 +680,387 @@ def kb_day_view(week_key: str, day_name: str, detailed: bool) -> InlineKeyboardM
     )
     return kb
 
+@lru_cache(maxsize=None)
 def kb_bells_back() -> InlineKeyboardMarkup:
     kb = InlineKeyboardMarkup(row_width=1)
     kb.add(InlineKeyboardButton("⬅️ Назад", callback_data="home"))
     return kb
 
 def kb_settings(user_state: Dict[str, Any], g: Dict[str, Any]) -> InlineKeyboardMarkup:
+    return _kb_settings(bool(user_state.get("notify_hour_before")), bool(user_state.get("notify_5min_before")),
+                        bool(INDEX.groups))
+
+@lru_cache(maxsize=8)
+def _kb_settings(hour: bool, five: bool, groups: bool = False) -> InlineKeyboardMarkup:
     kb = InlineKeyboardMarkup(row_width=1)
     kb.add(
         InlineKeyboardButton(
-            f"{'✅' if user_state.get('notify_hour_before') else '❌'} ⏰ За 1 год до першої",
+            f"{'✅' if hour else '❌'} ⏰ За 1 год до першої",
             callback_data="settings:toggle:hour"),
         InlineKeyboardButton(
-            f"{'✅' if user_state.get('notify_5min_before') else '❌'} ⌛ За 5 хв до кожної",
+            f"{'✅' if five else '❌'} ⌛ За 5 хв до кожної",
             callback_data="settings:toggle:5min"),
     )
+    if groups:
+        kb.add(InlineKeyboardButton("🎓 Обрати групу", callback_data="settings:groups:0"))
     kb.add(InlineKeyboardButton("⬅️ Назад", callback_data="home"))
     return kb
 
+GROUPS_PAGE = 24
+
+@lru_cache(maxsize=64)
+def kb_groups(groups: Tuple[str, ...], page: int) -> InlineKeyboardMarkup:
+    # callback_data ≤ 64 байт: "settings:group:" + назва групи (довжину тримає upload.MAX_GROUP_NAME_BYTES)
+    kb = InlineKeyboardMarkup(row_width=3)
+    if page == 0:
+        kb.add(InlineKeyboardButton("📘 Загальний розклад", callback_data="settings:group:"))
+    chunk = groups[page * GROUPS_PAGE:(page + 1) * GROUPS_PAGE]
+    kb.add(*(InlineKeyboardButton(name, callback_data=f"settings:group:{name}") for name in chunk))
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️", callback_data=f"settings:groups:{page - 1}"))
+    if (page + 1) * GROUPS_PAGE < len(groups):
+        nav.append(InlineKeyboardButton("➡️", callback_data=f"settings:groups:{page + 1}"))
+    if nav:
+        kb.row(*nav)
+    kb.add(InlineKeyboardButton("⬅️ Назад", callback_data="settings:open"))
+    return kb
+
 # ── SAFE EDIT ───────────────────────────────────────────────────────────────
+# Памʼятаємо, що показано в кожному повідомленні меню: повторне натискання
+# тієї ж кнопки не йде в Bot API взагалі (і не ловить «Message is not modified»).
+EDIT_CACHE = EditCache(
+    maxsize=int(os.getenv("EDIT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("EDIT_CACHE_TTL", "600")),
+)
+
+def _markup_key(reply_markup: Optional[InlineKeyboardMarkup]) -> str:
+    return reply_markup.as_json() if reply_markup is not None else ""
+
+def _already_shows(message: types.Message, text: str, markup_key: str) -> bool:
+    # без запису в кеші — звіряємося з тим, що Telegram прислав разом із callback
+    try:
+        return _markup_key(message.reply_markup) == markup_key and message.html_text == text
+    except Exception:
+        return False
+
 async def safe_edit(message: types.Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+    chat_id, message_id = message.chat.id, message.message_id
+    state = (text, _markup_key(reply_markup))
+    cached = EDIT_CACHE.get(chat_id, message_id)
+    # копія повідомлення з callback могла застаріти (натиснули до нашого попереднього
+    # редагування) — тож звіряємося з нею лише тоді, коли кеш нічого не знає
+    if cached == state or (cached is None and _already_shows(message, *state)):
+        M_EDIT_CACHE.inc(result="hit")
+        EDIT_CACHE.put(chat_id, message_id, state)
+        return
+    M_EDIT_CACHE.inc(result="miss")
     try:
         await message.edit_text(text, reply_markup=reply_markup, disable_web_page_preview=True)
     except Exception as e:
         if "Message is not modified" in str(e):
+            EDIT_CACHE.put(chat_id, message_id, state)
             return
-        await message.answer(text, reply_markup=reply_markup, disable_web_page_preview=True)
+        EDIT_CACHE.forget(chat_id, message_id)
+        sent = await message.answer(text, reply_markup=reply_markup, disable_web_page_preview=True)
+        if isinstance(sent, types.Message):
+            EDIT_CACHE.put(sent.chat.id, sent.message_id, state)
+        return
+    EDIT_CACHE.put(chat_id, message_id, state)
 
 # ── NOTIFICATIONS SCHEDULING ────────────────────────────────────────────────
-def _notif_job_id_prefix(chat_id: int) -> str:
-    return f"notif:{chat_id}:"
-
-def _clear_notif_jobs(chat_id: int):
-    pref = _notif_job_id_prefix(chat_id)
-    for job in list(scheduler.get_jobs()):
-        if job.id.startswith(pref):
-            try:
-                scheduler.remove_job(job.id)
-            except Exception:
-                pass
-
-def _first_pair_today(week_key: str, day_name: str) -> Optional[int]:
-    items = (CACHE.get(week_key) or {}).get(day_name, [])
-    if not items:
-        return None
-    return min(int(x.get("pair", 99)) for x in items)
-
-def _pairs_today(week_key: str, day_name: str) -> List[int]:
-    items = (CACHE.get(week_key) or {}).get(day_name, [])
-    return sorted(int(x.get("pair")) for x in items if "pair" in x)
-
-async def _send_hour_before(chat_id: int, week_key: str, day_name: str, first_pair: int):
-    try:
-        text = f"""⏰ Нагадування: за 1 год до першої пари
-
-{_pair_text(week_key, day_name, first_pair)}"""
-        msg = await bot.send_message(chat_id, text)
-        schedule_autodelete(chat_id, msg.message_id)
-    except Exception:
-        pass
-
-async def _send_5min_before(chat_id: int, week_key: str, day_name: str, pair_num: int):
-    try:
-        text = f"""⌛ Нагадування: за 5 хв до пари
+# Календар нагадувань на CALENDAR_DAYS днів уперед — відсортований масив слотів
+# (час, тиждень, день, [(група, тип, пара)]), який обходить один таймер.
+# У момент слота для кожної (група, тип, пара) текст рендериться один раз і
+# розсилається спільній множині підписників (група, тип).
+REMINDER_KINDS = ("hour", "5min")
+KIND_FLAGS = {"hour": "notify_hour_before", "5min": "notify_5min_before"}
+SLOT_PREFIX = "slot:"
+SubKey = Tuple[str, str]  # (група, тип нагадування)
+SUBSCRIBERS: Dict[SubKey, Set[int]] = {}
+_USER_SUBS: Dict[int, FrozenSet[SubKey]] = {}  # chat_id → ключі, де він підписаний
+# варіантів (група, прапорці) мало — _USER_SUBS ділить одні й ті самі frozenset
+_SUB_KEYS: Dict[Tuple[str, bool, bool], FrozenSet[SubKey]] = {}
+
+CALENDAR_DAYS = int(os.getenv("CALENDAR_DAYS", "14"))
+CALENDAR_JOB_ID = "global:reminders"
+CALENDAR: List[CalendarSlot] = []
+CALENDAR_TS: List[float] = []     # ts слотів — для bisect
+CALENDAR_BUILT: Optional[date] = None
+CALENDAR_FIRED_UNTIL = 0.0        # усе з ts ≤ цього вже розіслано; переживає рестарт
+
+def user_group(u: Dict[str, Any]) -> str:
+    group = u.get("group") or DEFAULT_GROUP
+    return group if INDEX.has_group(group) else DEFAULT_GROUP
+
+def _chat_group(chat_id: int) -> str:
+    return user_group(load_users().get(str(chat_id)) or {})
+
+def _first_pair_today(week_key: str, day_name: str, group: str = DEFAULT_GROUP) -> Optional[int]:
+    return INDEX.day(week_key, day_name, group).first_pair
+
+def _reminder_text(kind: str, week_key: str, day_name: str, pair_num: int, group: str = DEFAULT_GROUP,
+                   on: Optional[date] = None) -> str:
+    d = _dated_day(on, week_key, group) if on else INDEX.day(week_key, day_name, group)
+    return d.reminder_text(kind, int(pair_num))
+
+def _on_reminder_sent(chat_id: int, msg: types.Message):
+    schedule_autodelete(chat_id, msg.message_id)
+
+async def _send_reminder(chat_id: int, text: str, kind: str = ""):
+    msg = await broadcaster.send(chat_id, text)
+    M_REMINDERS.inc(kind=kind, outcome="sent" if msg is not None else "failed")
+    if msg is not None:
+        _on_reminder_sent(chat_id, msg)
+
+async def _send_hour_before(chat_id: int, week_key: str, day_name: str, first_pair: int, group: str = DEFAULT_GROUP):
+    await _send_reminder(chat_id, _reminder_text("hour", week_key, day_name, first_pair, group), "hour")
+
+async def _send_5min_before(chat_id: int, week_key: str, day_name: str, pair_num: int, group: str = DEFAULT_GROUP):
+    await _send_reminder(chat_id, _reminder_text("5min", week_key, day_name, pair_num, group), "5min")
+
+async def _enqueue_slot(tag: str, week_key: str, day_name: str, entries: Tuple[SlotEntry, ...],
+                        on: Optional[date] = None):
+    # шардований режим: по одному завданню на (текст, шард), розсилають воркери
+    items = []
+    for group, kind, pair_num in entries:
+        chat_ids = SUBSCRIBERS.get((group, kind))
+        if not chat_ids:
+            continue
+        text = _reminder_text(kind, week_key, day_name, pair_num, group, on)
+        for shard, ids in split_by_shard(chat_ids, REMINDER_WORKERS).items():
+            items.append((shard, {"tag": tag, "text": text, "chat_ids": ids}))
+        M_REMINDERS.inc(len(chat_ids), kind=kind, outcome="queued")
+    if items:
+        await run_io(OUTBOX.put_many, items)  # SQLite-транзакція — не на event loop
+        log.info("%s: queued %s jobs for %s workers", tag, len(items), REMINDER_WORKERS)
+
+async def _fire_slot(tag: str, week_key: str, day_name: str, entries: Tuple[SlotEntry, ...],
+                     on: Optional[date] = None):
+    if OUTBOX is not None:
+        await _enqueue_slot(tag, week_key, day_name, entries, on)
+        return
+    sends, kinds = [], []
+    for group, kind, pair_num in entries:
+        chat_ids = SUBSCRIBERS.get((group, kind))
+        if not chat_ids:
+            continue
+        # текст однаковий для всієї групи — рендер уже готовий в індексі
+        text = _reminder_text(kind, week_key, day_name, pair_num, group, on)
+        sends.append(broadcaster.broadcast(list(chat_ids), text, on_sent=_on_reminder_sent))
+        kinds.append(kind)
+    for kind, stats in zip(kinds, await asyncio.gather(*sends)):
+        M_REMINDERS.inc(stats.sent, kind=kind, outcome="sent")
+        M_REMINDERS.inc(stats.failed, kind=kind, outcome="failed")
+        log.info("%s: %r", tag, stats)
+
+def week_for_date(d: date, g: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Тиждень на дату d з урахуванням авто-ротації щопонеділка (auto_rotate_job),
+    канікул, що її зупиняють, і примусового тижня з винятків.
+    """
+    forced = OVERRIDES.week(d)
+    if forced:
+        return forced
+    g = g if g is not None else load_global()
+    week = g.get("week", "practical")
+    if not g.get("auto_rotate", True):
+        return week
+    today = datetime.now(TZ).date()
+    a, b = sorted((today - timedelta(days=today.weekday()), d - timedelta(days=d.weekday())))
+    return toggle_week_value(week) if OVERRIDES.rotations(a, b) % 2 else week
+
+def rebuild_calendar() -> Tuple[int, int]:
+    """Матеріалізує слоти на CALENDAR_DAYS днів і переводить таймер. → (додано, прибрано)"""
+    global CALENDAR_BUILT
+    g = load_global()
+    today = datetime.now(TZ).date()
+    new = materialize_calendar(INDEX, TZ, today, CALENDAR_DAYS, lambda d: week_for_date(d, g), _dated_day)
+    old = set(CALENDAR)
+    fresh = set(new)
+    CALENDAR[:] = new
+    CALENDAR_TS[:] = [slot[0] for slot in new]
+    CALENDAR_BUILT = today
+    _arm_calendar_timer()
+    return len(fresh - old), len(old - fresh)
+
+def _arm_calendar_timer():
+    # один date-таймер на найближчий нерозісланий слот, але не пізніше ніж за добу,
+    # щоб календар зсувався вперед і в дні без пар
+    now = time.time()
+    i = bisect_right(CALENDAR_TS, CALENDAR_FIRED_UNTIL)
+    nxt = min(CALENDAR_TS[i] if i < len(CALENDAR_TS) else now + 86400, now + 86400)
+    scheduler.add_job(
+        calendar_tick, "date",
+        id=CALENDAR_JOB_ID, run_date=datetime.fromtimestamp(max(nxt, now), TZ),
+        misfire_grace_time=REMINDER_GRACE, coalesce=True, replace_existing=True,
+    )
 
-{_pair_text(week_key, day_name, pair_num)}"""
-        msg = await bot.send_message(chat_id, text)
-        schedule_autodelete(chat_id, msg.message_id)
-    except Exception:
-        pass
+def _mark_fired(ts: float):
+    global CALENDAR_FIRED_UNTIL
+    CALENDAR_FIRED_UNTIL = ts
+    submit_io(STORAGE.save_state, "calendar", {"fired_until": ts})
+
+async def calendar_tick():
+    now = time.time()
+    i = bisect_right(CALENDAR_TS, CALENDAR_FIRED_UNTIL)
+    due = []
+    while i < len(CALENDAR_TS) and CALENDAR_TS[i] <= now:
+        if now - CALENDAR_TS[i] <= REMINDER_GRACE:
+            due.append(CALENDAR[i])
+        else:
+            M_ERRORS.inc(where="reminder_expired")
+        i += 1
+    if i and CALENDAR_TS[i - 1] > CALENDAR_FIRED_UNTIL:
+        _mark_fired(CALENDAR_TS[i - 1])
+    # новий день — зсуваємо горизонт (і тиждень після пропущеної ротації)
+    if CALENDAR_BUILT != datetime.now(TZ).date():
+        rebuild_calendar()
+    else:
+        _arm_calendar_timer()
+    fires = []
+    for ts, week, day, entries in due:
+        local = datetime.fromtimestamp(ts, TZ)
+        fires.append(_fire_slot(f"{SLOT_PREFIX}{local:%m-%d %H:%M}", week, day, entries, local.date()))
+    await asyncio.gather(*fires)
+
+def _user_sub_keys(u: Dict[str, Any]) -> FrozenSet[SubKey]:
+    if u.get("inactive"):
+        return frozenset()  # вимкнений після постійних збоїв — до наступного /start
+    group = user_group(u)
+    variant = (group, bool(u.get("notify_hour_before")), bool(u.get("notify_5min_before")))
+    keys = _SUB_KEYS.get(variant)
+    if keys is None:
+        keys = _SUB_KEYS[variant] = frozenset((group, kind) for kind, flag in KIND_FLAGS.items() if u.get(flag))
+    return keys
+
+def _set_user_subs(chat_id: int, keys: FrozenSet[SubKey]):
+    old = _USER_SUBS.get(chat_id, frozenset())
+    for k in old - keys:
+        subs = SUBSCRIBERS.get(k)
+        if subs is not None:
+            subs.discard(chat_id)
+    for k in keys - old:
+        SUBSCRIBERS.setdefault(k, set()).add(chat_id)
+    if keys:
+        _USER_SUBS[chat_id] = keys
+    else:
+        _USER_SUBS.pop(chat_id, None)
+
+def sync_user_subscriptions(chat_id: int):
+    """Оновлює членство юзера у множинах підписників за його групою і прапорцями."""
+    _set_user_subs(chat_id, _user_sub_keys(load_user(chat_id)))
+
+def mark_chat_inactive(chat_id: int, reason: str) -> bool:
+    """
+    Чат постійно не приймає повідомлень: прибрати з підписників, його власних
+    джоб (JOB_INDEX) і черги автовидалення, позначити в реєстрі. save_user позначку не переносить,
+    тож /start (як і будь-яка зміна налаштувань) повертає чат у розсилку.
+    """
+    users = load_users()
+    u = users.get(str(chat_id))
+    if u is None or u.get("inactive"):
+        return False
+    users[str(chat_id)] = {**u, "inactive": {"reason": reason, "at": int(time.time())}}
+    _mark_users_dirty(str(chat_id))
+    _set_user_subs(chat_id, frozenset())
+    clear_user_jobs(chat_id)
+    DELETE_QUEUE.drop_chat(chat_id)
+    M_PRUNED.inc(reason=reason)
+    log.info("chat %s switched off: %s", chat_id, reason)
+    return True
+
+WORKERS_WATCH_SECONDS = 10
+
+def watch_workers():
+    # упалий шард мовчки перестає розсилати своїм чатам — піднімаємо його знову
+    for shard, code in WORKER_POOL.respawn_dead():
+        M_WORKER_RESTARTS.inc(shard=str(shard))
+        log.error("reminder worker %s exited with %s, restarted", shard, code)
+
+async def collect_dead_chats():
+    # шардований режим: воркери складають недосяжні чати в outbox
+    for chat_id, reason in await run_io(OUTBOX.take_dead):
+        mark_chat_inactive(chat_id, reason)
+
+def format_users_report() -> str:
+    users = load_users()
+    reasons: Dict[str, int] = {}
+    recent = 0
+    week_ago = time.time() - 7 * 86400
+    for u in users.values():
+        off = u.get("inactive")
+        if off:
+            reasons[off.get("reason", "?")] = reasons.get(off.get("reason", "?"), 0) + 1
+            recent += off.get("at", 0) >= week_ago
+    pruned = sum(reasons.values())
+    lines = [
+        "👥 <b>Користувачі</b>",
+        f"• Усього: <b>{len(users)}</b>",
+        f"• Активних: <b>{len(users) - pruned}</b>, отримують нагадування: <b>{len(_USER_SUBS)}</b>",
+        f"• Вимкнено з розсилки: <b>{pruned}</b>" + (f", з них за 7 днів: {recent}" if pruned else ""),
+    ]
+    for reason, n in sorted(reasons.items(), key=lambda x: -x[1]):
+        lines.append(f"   {reason}: {n}")
+    lines.append(f"Поріг вимкнення: постійних збоїв поспіль — {DEAD_CHAT_THRESHOLD}" if DEAD_CHAT_THRESHOLD > 0
+                 else "Автовимкнення вимкнено (DEAD_CHAT_THRESHOLD=0)")
+    return "\n".join(lines)
 
-def schedule_today_notifications(chat_id: int):
-    g = load_global()                 # глобальний тиждень
-    u = load_user(chat_id)            # персональні прапорці
-    week_key = g.get("week", "practical")
-    dh = today_day_name(TZ)
-    bells = CACHE.get("bells") or {}
-
-    _clear_notif_jobs(chat_id)
-
-    first_pair = _first_pair_today(week_key, dh)
-    if first_pair is None:
-        return
-
-    now_tz = datetime.now(TZ)
-
-    # За 1 годину до першої
-    if u.get("notify_hour_before"):
-        start_str = bells.get(str(first_pair))
-        if start_str:
-            h, m = parse_bell_start(start_str)
-            dt = now_tz.replace(hour=h, minute=m, second=0, microsecond=0) - timedelta(hours=1)
-            if dt > now_tz:
-                scheduler.add_job(
-                    _send_hour_before, "date",
-                    id=f"{_notif_job_id_prefix(chat_id)}hour",
-                    run_date=dt, args=[chat_id, week_key, dh, first_pair],
-                    misfire_grace_time=300, replace_existing=True
-                )
-
-    # За 5 хв до кожної пари
-    if u.get("notify_5min_before"):
-        for p in _pairs_today(week_key, dh):
-            start_str = bells.get(str(p))
-            if not start_str:
-                continue
-            h, m = parse_bell_start(start_str)
-            dt = now_tz.replace(hour=h, minute=m, second=0, microsecond=0) - timedelta(minutes=5)
-            if dt > now_tz:
-                scheduler.add_job(
-                    _send_5min_before, "date",
-                    id=f"{_notif_job_id_prefix(chat_id)}p{p}",
-                    run_date=dt, args=[chat_id, week_key, dh, p],
-                    misfire_grace_time=300, replace_existing=True
-                )
+def replan_all():
+    """Перебудовує підписників і календар нагадувань для всього бота."""
+    SUBSCRIBERS.clear()
+    _USER_SUBS.clear()
+    for uid, u in load_users().items():
+        keys = _user_sub_keys(u)
+        if keys:
+            _set_user_subs(int(uid), keys)
+    rebuild_calendar()
+
+def apply_schedule_update(old: ScheduleIndex) -> Tuple[int, int]:
+    """
+    Після заміни INDEX: перебудувати календар (O(днів × груп × пар), без джоб на юзерів)
+    і пересинхронізувати лише тих, чия група зʼявилась або зникла.
+    """
+    changed_groups = set(old.groups) ^ set(INDEX.groups)
+    if changed_groups:
+        # зникла/зʼявилась група — перевести її учасників на загальний розклад або назад
+        for uid, u in load_users().items():
+            if u.get("group") in changed_groups:
+                sync_user_subscriptions(int(uid))
+    return rebuild_calendar()
+
+def format_replan_result(res: Tuple[int, int]) -> str:
+    added, removed = res
+    if not added and not removed:
+        return "нагадування без змін"
+    return f"календар нагадувань: +{added} −{removed} слотів"
 
 # ── AUTO-WEEK ROTATION (ГЛОБАЛЬНО) ─────────────────────────────────────────
 async def auto_rotate_job():
     g = load_global()
     if not g.get("auto_rotate", True):
         return
+    if OVERRIDES.rotation_paused(datetime.now(TZ).date()):
+        log.info("auto-rotate skipped: holiday week")
+        return
     g["week"] = toggle_week_value(g.get("week", "practical"))
     save_global(g)
-    reload_cache()
     # Сповістити адміна
     try:
         await bot.send_message(ADMIN_ID, f"🔄 Автоматично встановлено тиждень: <b>{week_label(g['week'])}</b>")
     except Exception:
-        pass
-    # Перепланувати нагадування всім користувачам
-    for uid in load_users().keys():
-        try:
-            schedule_today_notifications(int(uid))
-        except Exception:
-            pass
+        M_ERRORS.inc(where="admin_notify")
+    # Календар уже враховує ротацію; перебудова лише вирівнює його з новим тижнем
+    try:
+        rebuild_calendar()
+    except Exception:
+        M_ERRORS.inc(where="replan")
+        log.exception("replan failed")
 
-def schedule_fixed_jobs(chat_id: int):
-    # Щодня о 00:10 — оновити нагадування на день для КОНКРЕТНОГО юзера
-    scheduler.add_job(
-        schedule_today_notifications,
-        trigger="cron",
-        id=f"{chat_id}:replan_daily",
-        hour=0, minute=10,
-        args=[chat_id],
-        replace_existing=True,
-        misfire_grace_time=300,
-    )
+async def cache_refresh_job():
+    old = INDEX
+    if await refresh_cache():
+        log.info("schedule files changed: %s", format_replan_result(apply_schedule_update(old)))
 
 def schedule_global_jobs():
     # авто-ротація щопонеділка 00:05 — одна джоба на весь бот
@@ -419,90 +1073,199 @@ def schedule_global_jobs():
         replace_existing=True,
         misfire_grace_time=300,
     )
+    # Черга автовидалення — одна інтервальна джоба
+    scheduler.add_job(
+        drain_autodelete,
+        trigger="interval",
+        id="global:autodel_drain",
+        seconds=AUTODELETE_TICK,
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+    )
+    # Ручні правки файлів розкладу підхоплюємо за mtime, а не на кожному натисканні
+    scheduler.add_job(
+        cache_refresh_job,
+        trigger="interval",
+        id="global:cache_refresh",
+        seconds=CACHE_CHECK_SECONDS,
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+    )
+    # Недосяжні чати, про які звітували воркери розсилки
+    if OUTBOX is not None:
+        scheduler.add_job(
+            collect_dead_chats,
+            trigger="interval",
+            id="global:dead_chats",
+            seconds=CACHE_CHECK_SECONDS,
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+        )
+    if WORKER_POOL is not None:
+        scheduler.add_job(
+            watch_workers,
+            trigger="interval",
+            id="global:workers_watch",
+            seconds=WORKERS_WATCH_SECONDS,
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+        )
+
+# ── CALLBACK ROUTING ───────────────────────────────────────────────────────
+# Один обробник на всі callback_query: callback_data розбираємо один раз
+# і шукаємо обробник у словнику за префіксом ("sched:day", потім "admin").
+CALLBACK_ROUTES: Dict[str, Callable[[CallbackQuery, List[str]], Awaitable[None]]] = {}
+
+def callback_route(key: str):
+    def deco(fn):
+        CALLBACK_ROUTES[key] = fn
+        return fn
+    return deco
+
+def resolve_callback(data: str):
+    parts = (data or "").split(":")
+    handler = CALLBACK_ROUTES.get(":".join(parts[:2]))
+    if handler is not None:
+        return handler, parts[2:]
+    return CALLBACK_ROUTES.get(parts[0]), parts[1:]
+
+@dp.callback_query_handler()
+async def route_callback(c: CallbackQuery):
+    handler, args = resolve_callback(c.data)
+    if handler is None:
+        await c.answer()
+        return
+    await handler(c, args)
 
 # ── HANDLERS: HOME / START ─────────────────────────────────────────────────
 @dp.message_handler(commands=["start"])
 async def start(m: types.Message):
     u = load_user(m.chat.id)
-    save_user(m.chat.id, u)  # no-op якщо вже є
-    reload_cache()
-    schedule_fixed_jobs(m.chat.id)
-    schedule_today_notifications(m.chat.id)
+    save_user(m.chat.id, u)  # no-op якщо вже є; знімає позначку inactive
+    sync_user_subscriptions(m.chat.id)
 
     hello = "👋 Привіт! Я бот розкладу.\nОберіть дію:"
     await m.answer(hello, reply_markup=kb_main())
 
-@dp.callback_query_handler(lambda c: c.data == "home")
-async def go_home(c: CallbackQuery):
+@callback_route("home")
+async def go_home(c: CallbackQuery, args: List[str]):
     await safe_edit(c.message, "🏠 Головне меню:", reply_markup=kb_main())
     await c.answer()
 
 # ── HANDLERS: SCHEDULE ─────────────────────────────────────────────────────
-@dp.callback_query_handler(lambda c: c.data == "sched:open")
-async def sched_open(c: CallbackQuery):
+@callback_route("sched:open")
+async def sched_open(c: CallbackQuery, args: List[str]):
     await safe_edit(c.message, "📚 <b>Розклад пар</b>\nОберіть тип тижня:", reply_markup=kb_sched_weeks())
     await c.answer()
 
-@dp.callback_query_handler(lambda c: c.data.startswith("sched:week:"))
-async def sched_week(c: CallbackQuery):
-    _, _, week_key = c.data.split(":")
+@callback_route("sched:week")
+async def sched_week(c: CallbackQuery, args: List[str]):
+    week_key, = args
     await safe_edit(c.message, f"📅 Оберіть день • <b>{week_label(week_key)}</b> тиждень", reply_markup=kb_sched_days(week_key))
     await c.answer()
 
-@dp.callback_query_handler(lambda c: c.data.startswith("sched:day:"))
-async def sched_day(c: CallbackQuery):
-    _, _, week_key, day_name = c.data.split(":", 3)
-    text = format_day(week_key, day_name, detailed=False)
+@callback_route("sched:day")
+async def sched_day(c: CallbackQuery, args: List[str]):
+    week_key, day_name = args
+    text = format_day(week_key, day_name, detailed=False, group=_chat_group(c.message.chat.id))
     await safe_edit(c.message, text, reply_markup=kb_day_view(week_key, day_name, detailed=False))
     await c.answer()
 
-@dp.callback_query_handler(lambda c: c.data.startswith("sched:view:"))
-async def sched_view_toggle(c: CallbackQuery):
-    _, _, week_key, day_name, mode = c.data.split(":", 4)
+@callback_route("sched:view")
+async def sched_view_toggle(c: CallbackQuery, args: List[str]):
+    week_key, day_name, mode = args
     detailed = (mode == "detail")
-    text = format_day(week_key, day_name, detailed=detailed)
+    text = format_day(week_key, day_name, detailed=detailed, group=_chat_group(c.message.chat.id))
     await safe_edit(c.message, text, reply_markup=kb_day_view(week_key, day_name, detailed=detailed))
     await c.answer()
 
 # ── HANDLERS: BELLS ────────────────────────────────────────────────────────
-@dp.callback_query_handler(lambda c: c.data == "bells:open")
-async def cb_bells(c: CallbackQuery):
+@callback_route("bells:open")
+async def cb_bells(c: CallbackQuery, args: List[str]):
     txt = format_bells()
     await safe_edit(c.message, txt, reply_markup=kb_bells_back())
     await c.answer()
 
 # ── HANDLERS: SETTINGS (REMINDERS ONLY) ─────────────────────────────────────
-@dp.callback_query_handler(lambda c: c.data == "settings:open")
-async def settings_open(c: CallbackQuery):
+@callback_route("settings:open")
+async def settings_open(c: CallbackQuery, args: List[str]):
     g = load_global()
     u = load_user(c.message.chat.id)
-    text = (
-        "⚙️ <b>Налаштування</b>\n\n"
-        f"• Поточний тиждень: <b>{week_label(g.get('week','practical'))}</b>\n"
-        "• Увімкніть потрібні нагадування:"
-    )
-    await safe_edit(c.message, text, reply_markup=kb_settings(u, g))
+    await safe_edit(c.message, format_settings(g, u), reply_markup=kb_settings(u, g))
     await c.answer()
 
-@dp.callback_query_handler(lambda c: c.data.startswith("settings:toggle:"))
-async def settings_toggle(c: CallbackQuery):
-    kind = c.data.split(":", 2)[2]
-    u = load_user(c.message.chat.id)
+def toggle_setting(chat_id: int, kind: str) -> Dict[str, Any]:
+    u = load_user(chat_id)
     if kind == "hour":
         u["notify_hour_before"] = not u.get("notify_hour_before", False)
     elif kind == "5min":
         u["notify_5min_before"] = not u.get("notify_5min_before", False)
+    save_user(chat_id, u)
+    sync_user_subscriptions(chat_id)
+    return u
+
+@callback_route("settings:toggle")
+async def settings_toggle(c: CallbackQuery, args: List[str]):
+    u = toggle_setting(c.message.chat.id, ":".join(args))
+    await c.answer("Збережено ✅")
+    g = load_global()
+    await safe_edit(c.message, format_settings(g, u), reply_markup=kb_settings(u, g))
+
+async def _flush_toggles(key: Tuple[int, str], c: CallbackQuery, repeats: int):
+    # перше натискання вже застосоване; парна кількість повторів нічого не змінює
+    if repeats % 2 == 0:
+        return
+    chat_id, data = key
+    try:
+        u = toggle_setting(chat_id, data.split(":", 2)[2])
+        g = load_global()
+        await safe_edit(c.message, format_settings(g, u), reply_markup=kb_settings(u, g))
+    except Exception:
+        M_ERRORS.inc(where="coalesced_toggle")
+        log.exception("coalesced toggle failed")
+
+TOGGLES = Coalescer(COALESCE_WINDOW, _flush_toggles)
+
+@callback_route("settings:groups")
+async def settings_groups(c: CallbackQuery, args: List[str]):
+    page = int(args[0]) if args and args[0].isdigit() else 0
+    await safe_edit(c.message, "🎓 <b>Оберіть групу</b>", reply_markup=kb_groups(INDEX.groups, page))
+    await c.answer()
+
+@callback_route("settings:group")
+async def settings_group(c: CallbackQuery, args: List[str]):
+    group = ":".join(args)
+    if not INDEX.has_group(group):
+        await c.answer("Групу не знайдено", show_alert=True)
+        return
+    u = load_user(c.message.chat.id)
+    u["group"] = group
     save_user(c.message.chat.id, u)
-    reload_cache()
-    schedule_today_notifications(c.message.chat.id)
+    sync_user_subscriptions(c.message.chat.id)
     await c.answer("Збережено ✅")
     g = load_global()
-    text = (
-        "⚙️ <b>Налаштування</b>\n\n"
-        f"• Поточний тиждень: <b>{week_label(g.get('week','practical'))}</b>\n"
-        "• Увімкніть потрібні нагадування:"
-    )
-    await safe_edit(c.message, text, reply_markup=kb_settings(u, g))
+    await safe_edit(c.message, format_settings(g, u), reply_markup=kb_settings(u, g))
+
+# ── HANDLERS: INLINE SEARCH ────────────────────────────────────────────────
+@dp.inline_handler()
+async def inline_search(q: types.InlineQuery):
+    offset = int(q.offset) if (q.offset or "").isdigit() else 0
+    ids = SEARCH.search(q.query)
+    page = ids[offset:offset + INLINE_PAGE]
+    results = []
+    for i in page:
+        h = SEARCH.hit(i)
+        results.append(InlineQueryResultArticle(
+            id=str(i), title=h.title, description=h.description,
+            input_message_content=InputTextMessageContent(h.text, parse_mode="HTML"),
+        ))
+    next_offset = str(offset + INLINE_PAGE) if offset + INLINE_PAGE < len(ids) else ""
+    # відповідь однакова для всіх — Telegram кешує її на своєму боці
+    await q.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False, next_offset=next_offset)
 
 # ── HANDLERS: ADMIN ────────────────────────────────────────────────────────
 @dp.message_handler(commands=["admin"])
@@ -517,27 +1280,32 @@ async def admin_panel(m: types.Message):
         InlineKeyboardButton("📥 Оновити practical.json", callback_data="admin:upload:practical"),
         InlineKeyboardButton("📥 Оновити lecture.json",   callback_data="admin:upload:lecture"),
         InlineKeyboardButton("📥 Оновити bells.json",     callback_data="admin:upload:bells"),
+        InlineKeyboardButton("📥 Оновити розклад груп (schedule.json)", callback_data="admin:upload:groups"),
+        InlineKeyboardButton("📦 Додати/замінити групи (злиття)", callback_data="admin:upload:groups_merge"),
+        InlineKeyboardButton("📌 Оновити винятки (overrides.json)", callback_data="admin:upload:overrides"),
     )
     kb.add(
         InlineKeyboardButton(f"♻️ Перемкнути тиждень (зараз: {week_label(g.get('week','practical'))})", callback_data="admin:toggle_week"),
         InlineKeyboardButton("🔁 Авто-ротація: " + ("УВІМК" if g.get("auto_rotate", True) else "ВИМК"), callback_data="admin:toggle_auto"),
+        InlineKeyboardButton("👥 Користувачі: активні / вимкнені", callback_data="admin:users"),
     )
     kb.add(InlineKeyboardButton("❌ Закрити", callback_data="admin:close"))
     await m.answer("🔐 Адмін-панель:", reply_markup=kb)
 
-@dp.callback_query_handler(lambda c: c.data.startswith("admin:"))
-async def admin_actions(c: CallbackQuery):
+@callback_route("admin")
+async def admin_actions(c: CallbackQuery, args: List[str]):
     if c.from_user.id != ADMIN_ID:
         await c.answer("⛔ Ви не адміністратор цього бота.", show_alert=True)
         return
-    action = c.data.split(":",1)[1]
+    action = ":".join(args)
 
     if action == "download":
         sent = False
-        for name, path in (("practical.json", PRACTICAL_FILE), ("lecture.json", LECTURE_FILE), ("bells.json", BELLS_FILE)):
-            if path.exists():
+        for kind in SCHEDULE_KINDS:
+            body = await run_io(STORAGE.export_schedule, kind)
+            if body is not None:
                 try:
-                    await bot.send_document(c.from_user.id, InputFile(str(path), filename=name))
+                    await bot.send_document(c.from_user.id, InputFile(io.BytesIO(body), filename=f"{kind}.json"))
                     sent = True
                 except Exception:
                     pass
@@ -548,58 +1316,57 @@ async def admin_actions(c: CallbackQuery):
         return
 
     if action.startswith("upload:"):
+        from upload import UPLOAD_KINDS  # лише адмінські шляхи — не тягнемо на старті
         _, kind = action.split(":", 1)
+        if kind not in UPLOAD_KINDS:
+            await c.answer("Невідомий тип", show_alert=True)
+            return
         UPLOAD_WAIT[c.from_user.id] = kind
-        await safe_edit(c.message, f"Надішліть файл <b>{kind}.json</b> одним документом у відповідь на це повідомлення.")
+        if kind == "groups_merge":
+            await safe_edit(c.message, "Надішліть JSON <b>{\"groups\": {...}}</b>: перелічені групи буде додано або "
+                                       "замінено, <code>\"назва\": null</code> — видалено, решта лишиться як є.")
+        elif kind == "overrides":
+            await safe_edit(c.message, "Надішліть <b>overrides.json</b>: <code>{\"overrides\": [{\"from\": \"2026-12-29\", "
+                                       "\"to\": \"2027-01-07\", \"holiday\": \"Канікули\"}, ...]}</code>\n"
+                                       "Дії: holiday, cancel, move, replace, as, week; group — лише для однієї групи. "
+                                       "Файл замінює всі винятки.")
+        else:
+            await safe_edit(c.message, f"Надішліть файл <b>{kind}.json</b> одним документом у відповідь на це повідомлення.")
         await c.answer()
         return
 
     if action == "toggle_week":
         g = load_global()
         g["week"] = toggle_week_value(g.get("week", "practical"))
-        save_global(g); reload_cache()
+        save_global(g)
         await safe_edit(c.message, f"✅ Перемкнуто на: <b>{week_label(g['week'])}</b>", reply_markup=None)
-        for uid in load_users().keys():
-            try:
-                schedule_today_notifications(int(uid))
-            except Exception:
-                pass
+        try:
+            rebuild_calendar()
+        except Exception:
+            M_ERRORS.inc(where="replan")
+            log.exception("replan failed")
         await c.answer("Готово")
         return
 
     if action == "toggle_auto":
         g = load_global()
         g["auto_rotate"] = not g.get("auto_rotate", True)
-        save_global(g); reload_cache()
+        save_global(g)
+        rebuild_calendar()  # змінилась парність тижнів наперед
         await safe_edit(c.message, "Збережено ✅", reply_markup=None)
         await c.answer()
         return
 
+    if action == "users":
+        await safe_edit(c.message, format_users_report(), reply_markup=None)
+        await c.answer()
+        return
+
     if action == "close":
         await safe_edit(c.message, "Адмін-панель закрито.", reply_markup=None)
         await c.answer()
         return
 
-def _validate_payload(kind: str, data: Any):
-    try:
-        if kind in ("practical","lecture"):
-            if not isinstance(data, dict): return False, "Очікується обʼєкт { 'Понеділок': [ ... ] }"
-            for day, items in data.items():
-                if not isinstance(items, list): return False, f"{day}: очікується список"
-                for it in items:
-                    if not isinstance(it, dict): return False, f"{day}: елементи мають бути обʼєктами"
-                    if "pair" not in it or "subject" not in it: return False, f"{day}: потрібні поля 'pair' і 'subject'"
-        elif kind == "bells":
-            if not isinstance(data, dict): return False, "Очікується обʼєкт { '1': '09:00-10:20', ... }"
-            for k,v in data.items():
-                int(k)
-                if not isinstance(v, str): return False, "Час має бути рядком"
-        else:
-            return False, "Невідомий тип"
-    except Exception as e:
-        return False, f"Помилка валідації: {e}"
-    return True, "OK"
-
 @dp.message_handler(content_types=types.ContentType.DOCUMENT)
 async def on_doc(m: types.Message):
     if m.from_user.id != ADMIN_ID:
@@ -610,33 +1377,64 @@ async def on_doc(m: types.Message):
         await m.reply("Немає активного запиту на завантаження. Відкрий /admin → 'Оновити ...'")
         return
 
-    tmp = DATA_DIR / f"__upload_{kind}.json"
-    await m.document.download(destination=str(tmp))
-
+    from upload import LimitedBuffer, UploadError, format_diff, prepare_upload
     try:
-        data = json.loads(tmp.read_text(encoding="utf-8"))
-        ok, msg = _validate_payload(kind, data)
-        if not ok:
-            await m.reply("❌ " + msg)
-            tmp.unlink(missing_ok=True)
-            return
-        if kind == "practical":
-            PRACTICAL_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        elif kind == "lecture":
-            LECTURE_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        elif kind == "bells":
-            BELLS_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        reload_cache()
-        await m.reply("✅ Оновлено")
+        # розмір із метаданих відсікає завеликі файли ще до завантаження, буфер — якщо збрехали
+        if (m.document.file_size or 0) > UPLOAD_MAX_BYTES:
+            raise UploadError(f"Файл більший за {UPLOAD_MAX_BYTES // 1024} КБ")
+        buf = await m.document.download(destination_file=LimitedBuffer(UPLOAD_MAX_BYTES))
+        current = {k: CACHE.get(k) for k in SCHEDULE_KINDS}
+        target, data, diff = await run_io(prepare_upload, kind, buf.getvalue(), current)
+        await run_io(STORAGE.save_schedule, target, data)
+        old = INDEX
+        res = apply_schedule_update(old) if await refresh_cache() else (0, 0)
+        await m.reply(f"✅ Оновлено {target} • {format_replan_result(res)}\n{format_diff(diff)}")
+    except UploadError as e:
+        await m.reply(f"❌ {e}")
+        return
     except Exception as e:
         await m.reply(f"❌ Помилка: {e}")
-    finally:
-        try:
-            tmp.unlink(missing_ok=True)
-        except Exception:
-            pass
     UPLOAD_WAIT.pop(m.from_user.id, None)
 
+@dp.message_handler(commands=["stats"])
+async def admin_stats(m: types.Message):
+    if m.from_user.id != ADMIN_ID:
+        await m.reply("⛔ Ви не адміністратор цього бота.")
+        return
+    await m.answer(format_stats())
+
+def _ms(v: Optional[float]) -> str:
+    return "—" if v is None else f"{v * 1000:.0f} мс"
+
+def format_stats() -> str:
+    lines = ["📊 <b>Метрики</b>", ""]
+    routes = sorted(M_HANDLER_SECONDS.series(), key=lambda r: -r[1])
+    lines.append(f"• Апдейтів: <b>{sum(r[1] for r in routes)}</b>, помилок: <b>{M_HANDLER_ERRORS.total():.0f}</b>")
+    for labels, count, _, _ in routes[:5]:
+        lines.append(f"   {labels['route']}: {count} • p95 {_ms(M_HANDLER_SECONDS.quantile(0.95, **labels))}")
+    sent = sum(v for k, v in M_REMINDERS.values.items() if k[1] == "sent")
+    failed = sum(v for k, v in M_REMINDERS.values.items() if k[1] == "failed")
+    queued = sum(v for k, v in M_REMINDERS.values.items() if k[1] == "queued")
+    lines.append(f"• Нагадувань: надіслано <b>{sent:.0f}</b>, збоїв <b>{failed:.0f}</b>"
+                 + (f", у черзі воркерів {queued:.0f}" if queued else ""))
+    if M_THROTTLED.total():
+        lines.append(f"• Флуд: відкинуто {M_THROTTLED.get(reason='rate'):.0f}, злито перемикань {M_THROTTLED.get(reason='coalesced'):.0f}")
+    if M_PRUNED.total():
+        lines.append(f"• Вимкнено недосяжних чатів: {M_PRUNED.total():.0f} (деталі — /admin → Користувачі)")
+    lines.append(f"• sendMessage p95: {_ms(M_SEND_SECONDS.quantile(0.95, outcome='sent'))}")
+    lag = M_JOB_LAG.quantile(0.95, job=CALENDAR_JOB_ID)
+    lines.append(f"• Запізнення таймера нагадувань p95: {_ms(lag)}, пропущено джоб: "
+                 f"{sum(v for k, v in M_JOB_EVENTS.values.items() if k[1] == 'missed'):.0f}")
+    lines.append(f"• Слотів у календарі: {len(CALENDAR)}, прострочених: {M_ERRORS.get(where='reminder_expired'):.0f}")
+    lines.append(f"• Джоб: {len(scheduler.get_jobs())}, черга автовидалення: {len(DELETE_QUEUE)}, юзерів: {len(USERS)}")
+    io_ops = sorted(M_IO_SECONDS.series(), key=lambda r: -r[2])[:3]
+    if io_ops:
+        lines.append("• I/O: " + ", ".join(f"{l['op']} p95 {_ms(M_IO_SECONDS.quantile(0.95, **l))}" for l, _, _, _ in io_ops))
+    errors = ", ".join(f"{k[0]}={v:.0f}" for k, v in sorted(M_ERRORS.values.items()))
+    if errors:
+        lines.append(f"• Проковтнуті помилки: {errors}")
+    return "\n".join(lines)
+
 # ── HANDLER: TEST ───────────────────────────────────────────────────────────
 @dp.message_handler(commands=["test"])
 async def test_now(m: types.Message):
@@ -644,47 +1442,228 @@ async def test_now(m: types.Message):
     g = load_global()
     week_key = g.get("week", "practical")
     day_name = today_day_name(TZ)
-    pair_num = _first_pair_today(week_key, day_name) or 1  # якщо немає пар — візьмемо №1
+    group = _chat_group(m.chat.id)
+    pair_num = _first_pair_today(week_key, day_name, group) or 1  # якщо немає пар — візьмемо №1
 
     now = datetime.now(TZ)
 
     # Тест 'за 5 хв' → через 5 секунд
-    scheduler.add_job(
-        _send_5min_before, "date",
-        id=f"test:{m.chat.id}:5",
+    add_user_job(
+        m.chat.id, _send_5min_before, "date", f"test:{m.chat.id}:5",
         run_date=now + timedelta(seconds=5),
-        args=[m.chat.id, week_key, day_name, pair_num],
-        replace_existing=True,
+        args=[m.chat.id, week_key, day_name, pair_num, group],
         misfire_grace_time=300,
     )
 
     # Тест 'за 1 год' → через 10 секунд
-    scheduler.add_job(
-        _send_hour_before, "date",
-        id=f"test:{m.chat.id}:60",
+    add_user_job(
+        m.chat.id, _send_hour_before, "date", f"test:{m.chat.id}:60",
         run_date=now + timedelta(seconds=10),
-        args=[m.chat.id, week_key, day_name, pair_num],
-        replace_existing=True,
+        args=[m.chat.id, week_key, day_name, pair_num, group],
         misfire_grace_time=300,
     )
 
     await m.reply("🧪 Тест заплановано на +5с та +10с.")
 
+# ── HANDLER: PROFILE ───────────────────────────────────────────────────────
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+@dp.message_handler(commands=["profile"])
+async def admin_profile(m: types.Message):
+    """/profile [секунди] — cProfile + tracemalloc живого бота, звіт документом."""
+    if m.from_user.id != ADMIN_ID:
+        await m.reply("⛔ Ви не адміністратор цього бота.")
+        return
+    from profiler import ProfilerBusy, is_active, profile_loop, render_report  # поза /profile не вантажимо
+    if is_active():
+        await m.reply("❌ Профайлер уже працює — дочекайтеся звіту.")
+        return
+    arg = m.get_args().strip()
+    try:
+        seconds = float(arg) if arg else 10.0
+    except ValueError:
+        await m.reply("Формат: /profile [секунди]")
+        return
+    seconds = min(max(seconds, 1.0), PROFILE_MAX_SECONDS)
+    await m.reply(f"⏱ Профілюю {seconds:g} с…")
+    try:
+        result = await profile_loop(seconds)
+    except ProfilerBusy as e:
+        await m.reply(f"❌ Профайлер зайнятий: {e}")
+        return
+    report = await run_io(render_report, result)
+    name = f"profile-{datetime.now(TZ):%Y%m%d-%H%M%S}.txt"
+    await bot.send_document(m.chat.id, InputFile(io.BytesIO(report.encode("utf-8")), filename=name),
+                            caption=f"📈 {result[3]:.1f} с, пік памʼяті трасування {result[4] / 2 ** 20:.1f} MiB")
+
+# ── SNAPSHOT ────────────────────────────────────────────────────────────────
+# Скомпільований стан (юзери, індекси розкладу, підписники, календар на сьогодні)
+# пишеться при зупинці й читається на старті замість перебудови з JSON.
+# Змінився код, users або будь-який розклад — знімок ігнорується.
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", str(DATA_DIR / "snapshot.bin"))  # порожньо — вимкнено
+SNAPSHOT_CODE = tuple(BASE_DIR / f for f in ("bot.py", "timetable.py", "search.py", "overrides.py"))
+
+def _snapshot_sources() -> Dict[str, Any]:
+    return {
+        "code": code_fingerprint(SNAPSHOT_CODE),
+        "storage": STORAGE.name,
+        "users": STORAGE.users_version(),
+        "schedules": _schedule_versions(),
+        "legacy": file_version(LEGACY_STATE_FILE),
+    }
+
+def _calendar_key(day: Optional[date]) -> Tuple:
+    return day, json.dumps(load_global(), sort_keys=True), TZ_NAME, CALENDAR_DAYS
+
+def save_snapshot() -> None:
+    if not SNAPSHOT_FILE or not _USERS_LOADED or _USERS_DIRTY or _USERS_FULL_SYNC:
+        return  # на диску не те, що в памʼяті — знімок був би неузгодженим
+    sources = _snapshot_sources()
+    if sources["schedules"] != CACHE_VERSIONS:
+        return
+    state = {
+        "users": USERS, "cache": CACHE, "index": INDEX, "search": SEARCH, "overrides": OVERRIDES,
+        "subscribers": SUBSCRIBERS, "user_subs": _USER_SUBS,
+        "calendar": (_calendar_key(CALENDAR_BUILT), CALENDAR),
+    }
+    size = write_snapshot(Path(SNAPSHOT_FILE), sources, state)
+    log.info("snapshot written: %d users, %d KB", len(USERS), size // 1024)
+
+def restore_snapshot() -> bool:
+    """True — стан узято зі знімка; False — треба звичайна перебудова з файлів."""
+    global INDEX, SEARCH, OVERRIDES, _USERS_LOADED, CALENDAR_BUILT
+    if not SNAPSHOT_FILE:
+        return False
+    try:
+        sources = _snapshot_sources()
+        state = read_snapshot(Path(SNAPSHOT_FILE), sources)
+    except Exception:
+        M_ERRORS.inc(where="snapshot")
+        log.exception("snapshot read failed")
+        return False
+    if state is None:
+        return False
+    CACHE.update(state["cache"])
+    CACHE_VERSIONS.clear()
+    CACHE_VERSIONS.update(sources["schedules"])
+    INDEX, SEARCH, OVERRIDES = state["index"], state["search"], state["overrides"]
+    _dated_day.cache_clear()
+    USERS.clear()
+    USERS.update(state["users"])
+    _USERS_LOADED = True
+    SUBSCRIBERS.clear()
+    SUBSCRIBERS.update(state["subscribers"])
+    _USER_SUBS.clear()
+    _USER_SUBS.update(state["user_subs"])
+    today = datetime.now(TZ).date()
+    key, calendar = state["calendar"]
+    if key == _calendar_key(today):
+        CALENDAR[:] = calendar
+        CALENDAR_TS[:] = [slot[0] for slot in calendar]
+        CALENDAR_BUILT = today
+    return True
+
 # ── STARTUP ─────────────────────────────────────────────────────────────────
 async def on_startup(dp: Dispatcher):
-    reload_cache()
+    global CALENDAR_FIRED_UNTIL, METRICS_RUNNER
+    t0 = time.perf_counter()
+    restored = restore_snapshot()
+    if not restored:
+        reload_cache(force=True)
+        load_users()  # реєстр користувачів — один раз на старті
+    DELETE_QUEUE.load(STORAGE.load_state("autodelete", []))
+    # перший запуск — розсилаємо лише майбутнє; далі доганяємо пропущене в межах REMINDER_GRACE
+    now = time.time()
+    fired = (STORAGE.load_state("calendar") or {}).get("fired_until") or now
+    CALENDAR_FIRED_UNTIL = max(fired, now - REMINDER_GRACE)
     schedule_global_jobs()
 
-    # Стартуємо щоденний replan для всіх відомих юзерів
-    for uid in load_users().keys():
-        try:
-            cid = int(uid)
-            schedule_fixed_jobs(cid)
-            schedule_today_notifications(cid)
-        except Exception:
-            pass
+    # Стартуємо на паузі: з постійного сховища джоби вже підтягнуті —
+    # відновлюємо індекси, прибираємо застарілі й матеріалізуємо календар
+    if WORKER_POOL is not None:
+        WORKER_POOL.start()
+    scheduler.start(paused=True)
+    _rebuild_job_indexes()
+    try:
+        if not restored:
+            replan_all()
+        elif CALENDAR_BUILT == datetime.now(TZ).date():
+            _arm_calendar_timer()
+        else:
+            rebuild_calendar()  # знімок учорашній: підписники ті самі, календар — ні
+    except Exception:
+        M_ERRORS.inc(where="replan")
+        log.exception("replan failed")
+    scheduler.resume()
+    M_STARTUP.set(time.perf_counter() - t0)
+    log.info("started in %.0f ms (%s)", M_STARTUP.get() * 1000, "snapshot" if restored else "rebuild")
 
-    scheduler.start()
+    if METRICS_PORT:
+        try:
+            METRICS_RUNNER = await serve_metrics(METRICS, METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            log.warning("metrics endpoint disabled: %s", e)
+
+async def on_shutdown(dp: Dispatcher):
+    if METRICS_RUNNER is not None:
+        await METRICS_RUNNER.cleanup()
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    if WORKER_POOL is not None:
+        WORKER_POOL.stop()
+        OUTBOX.close()
+    IO_EXECUTOR.shutdown(wait=True)  # дочекатися фонових записів
+    flush_users()
+    save_autodelete_queue()
+    try:
+        save_snapshot()
+    except Exception:
+        log.exception("snapshot write failed")
+    STORAGE.close()
+
+# ── WEBHOOK ─────────────────────────────────────────────────────────────────
+WEBHOOK_PATH = f"/webhook/{WEBHOOK_SECRET}"
+
+def build_web_app():
+    """aiohttp-застосунок: POST WEBHOOK_PATH (з перевіркою секрету) + GET /healthz."""
+    from aiohttp import web
+    from aiogram.dispatcher.webhook import BOT_DISPATCHER_KEY, WebhookRequestHandler
+
+    class SecretWebhookHandler(WebhookRequestHandler):
+        async def post(self):
+            # Telegram надсилає secret_token із set_webhook у цьому заголовку
+            if self.request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+                raise web.HTTPForbidden()
+            return await super().post()
+
+    async def healthz(request):
+        return web.json_response({
+            "ok": True,
+            "scheduler": scheduler.running,
+            "users": len(USERS),
+            "workers": WORKER_POOL.alive() if WORKER_POOL is not None else [],
+        })
+
+    app = web.Application()
+    app.router.add_route("POST", WEBHOOK_PATH, SecretWebhookHandler, name="webhook_handler")
+    app.router.add_get("/healthz", healthz)
+    app[BOT_DISPATCHER_KEY] = dp
+    return app
+
+async def on_startup_webhook(dp: Dispatcher):
+    await on_startup(dp)
+    # апдейти, що прийшли під час рестарту, Telegram тримає і віддасть після set_webhook
+    await bot.set_webhook(WEBHOOK_HOST.rstrip("/") + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+
+def run_webhook():
+    ex = executor.set_webhook(
+        dp, None, web_app=build_web_app(),
+        on_startup=on_startup_webhook, on_shutdown=on_shutdown, skip_updates=False,
+    )
+    ex.run_app(host=WEBAPP_HOST, port=WEBAPP_PORT)
 
 if __name__ == "__main__":
-    executor.start_polling(dp, on_startup=on_startup, skip_updates=True)
+    if BOT_MODE == "webhook":
+        run_webhook()
+    else:
+        executor.start_polling(dp, on_startup=on_startup, on_shutdown=on_shutdown, skip_updates=True)
@@ -0,0 +1,206 @@
+# broadcast.py — розсилка одного тексту багатьом чатам у межах лімітів Telegram
+import asyncio, time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from aiogram.utils.exceptions import (BotBlocked, BotKicked, CantInitiateConversation, ChatNotFound,
+                                      NetworkError, RetryAfter, UserDeactivated)
+
+# чат недосяжний, поки користувач сам не повернеться — повтори не допоможуть
+DEAD_CHAT_ERRORS = (BotBlocked, BotKicked, UserDeactivated, ChatNotFound, CantInitiateConversation)
+
+def is_dead_chat(exc: BaseException) -> bool:
+    return isinstance(exc, DEAD_CHAT_ERRORS)
+
+# ── LIMITERS ────────────────────────────────────────────────────────────────
+class TokenBucket:
+    """Глобальний ліміт: rate токенів/с, запас до capacity; pause() — після 429."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+                self._ts = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class PerChatLimiter:
+    """Не частіше одного повідомлення в чат за interval секунд."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._next: Dict[int, float] = {}
+
+    def hold(self, chat_id: int, seconds: float) -> None:
+        self._next[chat_id] = max(self._next.get(chat_id, 0.0), time.monotonic() + seconds)
+
+    async def wait(self, chat_id: int) -> None:
+        now = time.monotonic()
+        at = self._next.get(chat_id, 0.0)
+        if at > now:
+            await asyncio.sleep(at - now)
+            now = time.monotonic()
+        self._next[chat_id] = now + self.interval
+        if len(self._next) > 50_000:
+            self._next = {k: v for k, v in self._next.items() if v > now}
+
+class DeadChats:
+    """
+    Постійні збої доставки поспіль на кожен чат. На threshold-му —
+    on_dead(chat_id, назва помилки) і лічильник забувається; успіх його скидає.
+    threshold ≤ 0 — лише класифікація, без відключення.
+    """
+
+    def __init__(self, threshold: int, on_dead: Callable[[int, str], None]):
+        self.threshold = threshold
+        self.on_dead = on_dead
+        self._fails: Dict[int, int] = {}
+
+    def failed(self, chat_id: int, exc: BaseException) -> bool:
+        """True — помилка постійна (чат заблокував бота, видалений тощо)."""
+        if not is_dead_chat(exc):
+            return False
+        if self.threshold > 0:
+            n = self._fails.get(chat_id, 0) + 1
+            if n >= self.threshold:
+                self._fails.pop(chat_id, None)
+                self.on_dead(chat_id, type(exc).__name__)
+            else:
+                self._fails[chat_id] = n
+        return True
+
+    def delivered(self, chat_id: int) -> None:
+        if self._fails:
+            self._fails.pop(chat_id, None)
+
+# ── STATS ───────────────────────────────────────────────────────────────────
+class BroadcastStats:
+    __slots__ = ("total", "sent", "failed", "retried", "errors", "started", "elapsed", "max_latency")
+
+    def __init__(self, total: int):
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.errors: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+        self.max_latency = 0.0
+
+    def fail(self, exc: BaseException) -> None:
+        self.failed += 1
+        name = type(exc).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def __repr__(self) -> str:
+        rate = self.sent / self.elapsed if self.elapsed else 0.0
+        return (f"<BroadcastStats sent={self.sent}/{self.total} failed={self.failed} "
+                f"retried={self.retried} {self.elapsed:.2f}s ({rate:.1f} msg/s) errors={self.errors}>")
+
+# ── BROADCASTER ─────────────────────────────────────────────────────────────
+class Broadcaster:
+    """
+    Пул воркерів над asyncio.Queue: кожен бере chat_id, чекає на per-chat і
+    глобальний ліміт, надсилає і повторює при RetryAfter / мережевих помилках.
+    bot — будь-що з async send_message(chat_id, text, **kw).
+    on_result(outcome, seconds) — гачок для метрик: sent / failed / dead / retry / retry_after.
+    dead — облік недосяжних чатів (DeadChats), щоб їх прибрали з розсилки.
+    """
+
+    def __init__(self, bot, rate: float = 25.0, per_chat_interval: float = 1.0,
+                 workers: int = 16, max_retries: int = 3,
+                 on_result: Optional[Callable[[str, float], None]] = None,
+                 dead: Optional[DeadChats] = None):
+        self.bot = bot
+        self.on_result = on_result
+        self.dead = dead
+        self.bucket = TokenBucket(rate)
+        self.per_chat = PerChatLimiter(per_chat_interval)
+        self.workers = workers
+        self.max_retries = max_retries
+
+    async def send(self, chat_id: int, text: str, stats: Optional[BroadcastStats] = None, **kwargs):
+        """Одне повідомлення з лімітами й повторами; повертає Message або None."""
+        stats = stats or BroadcastStats(1)
+        attempt = 0
+        while True:
+            await self.per_chat.wait(chat_id)
+            await self.bucket.acquire()
+            t0 = time.monotonic()
+            try:
+                msg = await self.bot.send_message(chat_id, text, **kwargs)
+            except RetryAfter as e:
+                # 429: пригальмувати і весь потік, і цей чат; спробу не рахуємо
+                self._report("retry_after", t0)
+                stats.retried += 1
+                self.bucket.pause(e.timeout)
+                self.per_chat.hold(chat_id, e.timeout)
+                continue
+            except (NetworkError, asyncio.TimeoutError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self._report("failed", t0)
+                    stats.fail(e)
+                    return None
+                self._report("retry", t0)
+                stats.retried += 1
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 10.0))
+                continue
+            except Exception as e:
+                self._report("dead" if is_dead_chat(e) else "failed", t0)
+                stats.fail(e)
+                if self.dead is not None:
+                    self.dead.failed(chat_id, e)
+                return None
+            self._report("sent", t0)
+            if self.dead is not None:
+                self.dead.delivered(chat_id)
+            stats.sent += 1
+            stats.max_latency = max(stats.max_latency, time.monotonic() - t0)
+            return msg
+
+    def _report(self, outcome: str, t0: float) -> None:
+        if self.on_result is not None:
+            self.on_result(outcome, time.monotonic() - t0)
+
+    async def broadcast(self, chat_ids: Iterable[int], text: str,
+                        on_sent: Optional[Callable[[int, Any], None]] = None,
+                        **kwargs) -> BroadcastStats:
+        ids: List[int] = list(chat_ids)
+        stats = BroadcastStats(len(ids))
+        queue: "asyncio.Queue[int]" = asyncio.Queue()
+        for cid in ids:
+            queue.put_nowait(cid)
+
+        async def worker():
+            while True:
+                try:
+                    cid = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                msg = await self.send(cid, text, stats, **kwargs)
+                if msg is not None and on_sent is not None:
+                    try:
+                        on_sent(cid, msg)
+                    except Exception:
+                        pass
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(ids)))))
+        stats.elapsed = time.monotonic() - stats.started
+        return stats
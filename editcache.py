@@ -0,0 +1,43 @@
+# editcache.py — останній відрендерений стан повідомлень бота (LRU + TTL)
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+MessageKey = Tuple[int, int]  # (chat_id, message_id)
+
+class EditCache:
+    """
+    (chat_id, message_id) → що зараз показано (текст + хеш клавіатури).
+    Якщо нове редагування збігається — запит до Bot API не потрібен.
+    Записи старші за ttl вважаються невідомими: повідомлення могли змінити деінде.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[MessageKey, Tuple[float, Hashable]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, chat_id: int, message_id: int) -> Optional[Hashable]:
+        key = (chat_id, message_id)
+        item = self._data.get(key)
+        if item is None:
+            return None
+        ts, state = item
+        if time.monotonic() - ts > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return state
+
+    def put(self, chat_id: int, message_id: int, state: Hashable) -> None:
+        key = (chat_id, message_id)
+        self._data[key] = (time.monotonic(), state)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def forget(self, chat_id: int, message_id: int) -> None:
+        self._data.pop((chat_id, message_id), None)
@@ -0,0 +1,124 @@
+# jobstore.py — постійне сховище джоб APScheduler у локальному SQLite (без SQLAlchemy)
+import pickle, sqlite3, threading
+from pathlib import Path
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    Аналог SQLAlchemyJobStore на stdlib sqlite3. Джоби серіалізуються через
+    pickle, тож func має бути функцією рівня модуля, а args — примітивами.
+    """
+
+    def __init__(self, path: Path, tablename: str = "apscheduler_jobs",
+                 pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.path = Path(path)
+        self.tablename = tablename
+        self.pickle_protocol = pickle_protocol
+        self._lock = threading.Lock()
+        self._db = None
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.tablename} ("
+            "id TEXT PRIMARY KEY, next_run_time REAL, job_state BLOB NOT NULL)"
+        )
+        self._db.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.tablename}_next ON {self.tablename}(next_run_time)"
+        )
+
+    def lookup_job(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT job_state FROM {self.tablename} WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT next_run_time FROM {self.tablename} WHERE next_run_time IS NOT NULL "
+                "ORDER BY next_run_time LIMIT 1"
+            ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        state = pickle.dumps(job.__getstate__(), self.pickle_protocol)
+        try:
+            with self._lock:
+                self._db.execute(
+                    f"INSERT INTO {self.tablename}(id, next_run_time, job_state) VALUES (?,?,?)",
+                    (job.id, datetime_to_utc_timestamp(job.next_run_time), state),
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        state = pickle.dumps(job.__getstate__(), self.pickle_protocol)
+        with self._lock:
+            cur = self._db.execute(
+                f"UPDATE {self.tablename} SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time), state, job.id),
+            )
+        if cur.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with self._lock:
+            cur = self._db.execute(f"DELETE FROM {self.tablename} WHERE id = ?", (job_id,))
+        if cur.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.tablename}")
+
+    def shutdown(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = "", params=()):
+        jobs = []
+        failed = []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, job_state FROM {self.tablename} {where} ORDER BY next_run_time", params
+            ).fetchall()
+        for job_id, state in rows:
+            try:
+                jobs.append(self._reconstitute_job(state))
+            except BaseException:
+                self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                failed.append(job_id)
+        if failed:
+            with self._lock:
+                self._db.executemany(f"DELETE FROM {self.tablename} WHERE id = ?", ((i,) for i in failed))
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (path={self.path})>"
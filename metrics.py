@@ -0,0 +1,187 @@
+# metrics.py — мінімальні метрики у текстовому форматі Prometheus (без залежностей)
+import bisect, time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelKey = Tuple[str, ...]
+
+# секунди: від швидких хендлерів до запізнілих джоб
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        k = self._key(labels)
+        self.values[k] = self.values.get(k, 0.0) + value
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in sorted(self.values.items())
+        ]
+
+class Gauge(_Metric):
+    """Значення або функція, що рахує його в момент збору (довжина черги, кількість джоб)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, func: Optional[Callable[[], float]] = None):
+        super().__init__(name, help)
+        self.func = func
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def get(self) -> float:
+        if self.func is not None:
+            try:
+                return float(self.func())
+            except Exception:
+                return float("nan")
+        return self.value
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name} {_fmt_value(self.get())}"]
+
+class _HistValue:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self, n: int):
+        self.counts = [0] * n
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (float("inf"),)
+        self.values: Dict[LabelKey, _HistValue] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        h = self.values.get(k)
+        if h is None:
+            h = self.values[k] = _HistValue(len(self.buckets))
+        h.counts[bisect.bisect_left(self.buckets, value)] += 1
+        h.sum += value
+        h.count += 1
+        if value > h.max:
+            h.max = value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        # верхня межа кошика, у який потрапляє q-та частка спостережень
+        h = self.values.get(self._key(labels))
+        if h is None or not h.count:
+            return None
+        rank, acc = q * h.count, 0
+        for bound, n in zip(self.buckets, h.counts):
+            acc += n
+            if acc >= rank:
+                return min(bound, h.max)
+        return h.max
+
+    def series(self) -> List[Tuple[Dict[str, str], int, float, float]]:
+        """[(мітки, count, sum, max)] — для людських зведень поза Prometheus."""
+        return [(dict(zip(self.labelnames, k)), h.count, h.sum, h.max) for k, h in self.values.items()]
+
+    def render(self) -> List[str]:
+        out = self.header()
+        for k, h in sorted(self.values.items()):
+            acc = 0
+            for bound, n in zip(self.buckets, h.counts):
+                acc += n
+                le = 'le="' + _fmt_value(bound) + '"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_value(h.sum)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {h.count}")
+        return out
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _add(self, m: _Metric):
+        self.metrics[m.name] = m
+        return m
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, func: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._add(Gauge(name, help, func))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+async def serve_metrics(registry: Registry, host: str, port: int):
+    """Окремий aiohttp-сервер лише з GET /metrics; повертає AppRunner для cleanup()."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,126 @@
+# outbox.py — локальна черга між фронт-процесом і воркерами розсилки (SQLite, WAL)
+import json, sqlite3, threading, time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    shard   INTEGER NOT NULL,
+    created REAL    NOT NULL,
+    claimed REAL,
+    payload TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_shard ON outbox(shard, claimed, id);
+CREATE TABLE IF NOT EXISTS dead_chats (
+    chat_id INTEGER PRIMARY KEY,
+    reason  TEXT    NOT NULL,
+    at      REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS worker_state (
+    shard INTEGER NOT NULL,
+    name  TEXT    NOT NULL,
+    body  TEXT    NOT NULL,
+    PRIMARY KEY (shard, name)
+);
+"""
+
+class Outbox:
+    """
+    Фронт кладе завдання put(shard, payload), воркер шарда забирає claim(),
+    а після розсилки підтверджує ack(). Непідтверджене після падіння воркера
+    повертається в чергу release_claimed() — доставка «щонайменше раз».
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(OUTBOX_SCHEMA)
+
+    def put_many(self, items: List[Tuple[int, Dict[str, Any]]]) -> None:
+        now = time.time()
+        rows = [(shard, now, json.dumps(payload, ensure_ascii=False)) for shard, payload in items]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("INSERT INTO outbox(shard, created, payload) VALUES (?,?,?)", rows)
+            self._db.execute("COMMIT")
+
+    def claim(self, shard: int, limit: int = 20) -> List[Tuple[int, float, Dict[str, Any]]]:
+        """[(id, created, payload)] — created потрібен воркеру, щоб не слати прострочене."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT id, created, payload FROM outbox WHERE shard = ? AND claimed IS NULL ORDER BY id LIMIT ?",
+                    (shard, limit),
+                ).fetchall()
+                if rows:
+                    self._db.executemany(
+                        "UPDATE outbox SET claimed = ? WHERE id = ?", ((time.time(), r[0]) for r in rows)
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [(rid, created, json.loads(body)) for rid, created, body in rows]
+
+    def ack(self, ids: List[int]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", ((i,) for i in ids))
+
+    def release_claimed(self, shard: int) -> int:
+        with self._lock:
+            cur = self._db.execute("UPDATE outbox SET claimed = NULL WHERE shard = ? AND claimed IS NOT NULL", (shard,))
+        return cur.rowcount
+
+    # недосяжні чати: воркер повідомляє, фронт забирає і відключає в реєстрі юзерів
+    def report_dead(self, chat_id: int, reason: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO dead_chats(chat_id, reason, at) VALUES (?,?,?)",
+                             (chat_id, reason, time.time()))
+
+    def take_dead(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute("SELECT chat_id, reason FROM dead_chats").fetchall()
+                self._db.execute("DELETE FROM dead_chats")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return rows
+
+    # невеликий стан воркера (напр. черга автовидалення) — переживає рестарт
+    def load_state(self, shard: int, name: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body FROM worker_state WHERE shard = ? AND name = ?", (shard, name)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def save_state(self, shard: int, name: str, data: Any) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO worker_state(shard, name, body) VALUES (?,?,?) "
+                "ON CONFLICT(shard, name) DO UPDATE SET body = excluded.body",
+                (shard, name, json.dumps(data)),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def shard_of(chat_id: int, shards: int) -> int:
+    return chat_id % shards
+
+def split_by_shard(chat_ids, shards: int) -> Dict[int, List[int]]:
+    out: Dict[int, List[int]] = {}
+    for cid in chat_ids:
+        out.setdefault(shard_of(cid, shards), []).append(cid)
+    return out
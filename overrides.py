@@ -0,0 +1,133 @@
+# overrides.py — винятки на дати: канікули, скасовані/перенесені/замінені пари, інший тиждень
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from timetable import UA_DAYS, DayIndex, PairRecord, ScheduleIndex, week_label
+
+# overrides.json: {"overrides": [
+#   {"from": "2026-12-29", "to": "2027-01-07", "holiday": "Зимові канікули"},
+#   {"from": "2026-11-04", "group": "КН-21", "cancel": [3, 4]},
+#   {"from": "2026-11-05", "move": {"2": 5}},
+#   {"from": "2026-11-06", "replace": {"2": {"subject": "...", "teacher": "...", "room": "..."}}},
+#   {"from": "2026-11-08", "as": "Понеділок"},
+#   {"from": "2027-01-12", "to": "2027-01-16", "week": "lecture"}]}
+# to — включно (без нього — один день), group — лише для однієї групи, note — довільна примітка.
+# Кілька винятків на одну дату застосовуються в порядку файлу.
+# Канікули на всі групи, що накривають понеділок, зупиняють авто-ротацію тижня.
+
+def parse_date(v: str) -> date:
+    return date.fromisoformat(str(v).strip())
+
+class Override:
+    __slots__ = ("first", "last", "group", "holiday", "cancel", "move", "replace", "as_day", "week", "note")
+
+    def __init__(self, it: Dict[str, Any]):
+        self.first = parse_date(it["from"])
+        self.last = parse_date(it["to"]) if it.get("to") else self.first
+        self.group: Optional[str] = it.get("group")  # None — усі групи
+        self.holiday: Optional[str] = it.get("holiday")
+        self.cancel = frozenset(int(p) for p in it.get("cancel") or ())
+        self.move = tuple((int(a), int(b)) for a, b in (it.get("move") or {}).items())
+        self.replace = tuple((int(p), v) for p, v in (it.get("replace") or {}).items())
+        self.as_day: Optional[str] = it.get("as")
+        self.week: Optional[str] = it.get("week")
+        self.note: str = it.get("note") or ""
+
+    def applies(self, group: str) -> bool:
+        return self.group is None or self.group == group
+
+    def describe(self) -> str:
+        parts = []
+        if self.holiday is not None:
+            parts.append(f"🏖 {self.holiday or 'вихідний'}")
+        if self.week:
+            parts.append(f"{week_label(self.week)} тиждень")
+        if self.as_day:
+            parts.append(f"за розкладом: {self.as_day}")
+        if self.cancel:
+            parts.append("скасовано: " + ", ".join(f"{p} пара" for p in sorted(self.cancel)))
+        if self.move:
+            parts.append("перенесено: " + ", ".join(f"{a}→{b} пара" for a, b in self.move))
+        if self.replace:
+            parts.append("заміна: " + ", ".join(f"{p} пара" for p, _ in self.replace))
+        if self.note:
+            parts.append(self.note)
+        return "; ".join(parts)
+
+def _moved(r: PairRecord, pair: int, bells: Dict[str, str]) -> PairRecord:
+    return PairRecord(pair, r.subject, r.teacher, r.room, bells.get(str(pair), r.hours))
+
+class OverrideIndex:
+    """
+    Відрізки дат можуть перекриватися, тож при побудові межі всіх винятків
+    ріжуть вісь дат на елементарні проміжки з готовим кортежем активних винятків;
+    запит на дату — один bisect. Замінюється цілком разом із файлом.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.items: Tuple[Override, ...] = tuple(Override(it) for it in (data or {}).get("overrides") or ())
+        bounds = sorted({o.first.toordinal() for o in self.items}
+                        | {o.last.toordinal() + 1 for o in self.items})
+        self._starts: List[int] = bounds
+        self._active: List[Tuple[Override, ...]] = [
+            tuple(o for o in self.items if o.first.toordinal() <= b <= o.last.toordinal()) for b in bounds
+        ]
+        # понеділки під канікулами на всі групи — ротації в них немає
+        paused = set()
+        for o in self.items:
+            if o.holiday is not None and o.group is None:
+                d = o.first + timedelta(days=-o.first.weekday() % 7)
+                while d <= o.last:
+                    paused.add(d.toordinal())
+                    d += timedelta(days=7)
+        self._paused: List[int] = sorted(paused)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def at(self, d: date) -> Tuple[Override, ...]:
+        i = bisect_right(self._starts, d.toordinal()) - 1
+        return self._active[i] if i >= 0 else ()
+
+    def week(self, d: date) -> Optional[str]:
+        """Тиждень, примусово заданий на дату (лише винятки на всі групи)."""
+        week = None
+        for o in self.at(d):
+            if o.week and o.group is None:
+                week = o.week
+        return week
+
+    def rotation_paused(self, monday: date) -> bool:
+        return self.rotations(monday - timedelta(days=7), monday) == 0
+
+    def rotations(self, a: date, b: date) -> int:
+        """Скільки ротацій між понеділками a < b: тижні (a, b] без канікулярних понеділків."""
+        lo, hi = a.toordinal(), b.toordinal()
+        paused = bisect_right(self._paused, hi) - bisect_right(self._paused, lo)
+        return (hi - lo) // 7 - paused
+
+    def day(self, index: ScheduleIndex, d: date, week: str, group: str) -> DayIndex:
+        """День розкладу на конкретну дату з урахуванням винятків групи."""
+        ovs = [o for o in self.at(d) if o.applies(group)]
+        day = UA_DAYS[d.weekday()]
+        if not ovs:
+            return index.day(week, day, group)
+        src = day
+        for o in ovs:
+            src = o.as_day or src
+        pairs = list(index.day(week, src, group).pairs)
+        for o in ovs:
+            if o.holiday is not None:
+                pairs = []
+            if o.cancel:
+                pairs = [r for r in pairs if r.pair not in o.cancel]
+            for a, b in o.move:
+                pairs = [_moved(r, b, index.bells) if r.pair == a else r for r in pairs]
+            for p, it in o.replace:
+                rec = PairRecord(p, it.get("subject", ""), it.get("teacher", ""), it.get("room", ""),
+                                 it.get("hours") or index.bells.get(str(p)))
+                pairs = [r for r in pairs if r.pair != p] + [rec]
+        pairs.sort(key=lambda r: r.pair)
+        note = f"{d:%d.%m}: " + "; ".join(filter(None, (o.describe() for o in ovs)))
+        return DayIndex(week, day, tuple(pairs), group, note)
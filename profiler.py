@@ -0,0 +1,73 @@
+# profiler.py — профіль живого event loop на обмежене вікно: cProfile + tracemalloc
+import asyncio, cProfile, io, pstats, time, tracemalloc
+from typing import Tuple
+
+class ProfilerBusy(RuntimeError):
+    """Вікно профілювання вже відкрите (або sys.setprofile зайнятий кимось іншим)."""
+
+_ACTIVE = False
+
+# власні алокації tracemalloc і імпортера — шум у звіті
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+ProfileResult = Tuple[cProfile.Profile, tracemalloc.Snapshot, tracemalloc.Snapshot, float, int]
+
+async def profile_loop(seconds: float, frames: int = 1) -> ProfileResult:
+    """
+    Вмикає cProfile для потоку event loop (тобто для всіх хендлерів і джоб)
+    і tracemalloc на seconds секунд. Поза вікном — нуль накладних витрат:
+    нічого не ввімкнено, поки адмін не попросив.
+    """
+    global _ACTIVE
+    if _ACTIVE:
+        raise ProfilerBusy("вже профілюється")
+    _ACTIVE = True
+    prof = cProfile.Profile()
+    own_trace = not tracemalloc.is_tracing()  # якщо tracemalloc увімкнули ззовні — не вимикаємо
+    try:
+        if own_trace:
+            tracemalloc.start(frames)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            prof.enable()
+        except ValueError as e:  # інший профайлер уже стоїть на потоці
+            raise ProfilerBusy(str(e))
+        t0 = time.perf_counter()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            prof.disable()
+            elapsed = time.perf_counter() - t0
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+        return prof, before, after, elapsed, peak
+    finally:
+        if own_trace:
+            tracemalloc.stop()
+        _ACTIVE = False
+
+def is_active() -> bool:
+    return _ACTIVE
+
+def render_report(result: ProfileResult, top: int = 30) -> str:
+    """Текстовий звіт; важкий — кличемо з IO-потоку."""
+    prof, before, after, elapsed, peak = result
+    out = io.StringIO()
+    out.write(f"event loop profile: {elapsed:.1f}s window, tracemalloc peak {peak / 2 ** 20:.1f} MiB\n")
+
+    stats = pstats.Stats(prof, stream=out)
+    stats.strip_dirs()
+    for key, title in (("tottime", "own time"), ("cumulative", "cumulative time")):
+        out.write(f"\n{'=' * 20} top {top} by {title} {'=' * 20}\n")
+        stats.sort_stats(key).print_stats(top)
+
+    out.write(f"\n{'=' * 20} top {top} allocations during window (still alive) {'=' * 20}\n")
+    diff = after.filter_traces(_TRACE_FILTERS).compare_to(before.filter_traces(_TRACE_FILTERS), "lineno")
+    for d in [d for d in diff if d.size_diff > 0][:top]:
+        out.write(f"{d.size_diff / 1024:10.1f} KiB {d.count_diff:+8d} blocks  {d.traceback}\n")
+    return out.getvalue()
@@ -0,0 +1,107 @@
+# search.py — пошук пар за предметом, викладачем і аудиторією для inline-режиму
+import re
+from typing import Dict, FrozenSet, List, Tuple
+
+from timetable import UA_DAYS, WEEK_KEYS, DayIndex, PairRecord, ScheduleIndex, pair_emoji, week_label
+
+MAX_PREFIX = 12    # довші префікси однаково майже унікальні — не роздуваємо словник
+MAX_CACHED = 4096  # готових відповідей: гортання сторінок повторює той самий запит
+
+_APOSTROPHES = re.compile(r"[ʼ'`’‘ʹ]")
+_NON_WORD = re.compile(r"[^\w]+")
+
+def normalize(text: str) -> str:
+    """Без регістру й апострофів, розділові знаки → пробіли: "Об'єктно-О" → "обєктно о"."""
+    text = _APOSTROPHES.sub("", (text or "").casefold()).replace("ё", "е")
+    return _NON_WORD.sub(" ", text).strip()
+
+def _trigrams(token: str):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class SearchHit:
+    __slots__ = ("title", "description", "text")
+
+    def __init__(self, d: DayIndex, r: PairRecord):
+        where = f"{d.day}, {r.pair} пара • {week_label(d.week)}" + (f" • {d.group}" if d.group else "")
+        head = f"📆 <b>{d.day}</b> • {week_label(d.week)} тиждень" + (f" • {d.group}" if d.group else "")
+        self.title = f"{pair_emoji(r.pair)} {r.subject}"
+        self.description = " • ".join(x for x in (where, r.hours, r.room, r.teacher) if x)
+        self.text = f"{head}\n\n{r.text}"
+
+class SearchIndex:
+    """
+    Будується разом з ScheduleIndex і так само замінюється цілком.
+    Токен запиту → множина пар через словник префіксів (точний збіг на початку
+    слова) або, якщо такого префікса немає, через триграми з перевіркою підрядка.
+    Кілька токенів — перетин. Тексти результатів — hit(i), лише для показаної сторінки.
+    """
+
+    def __init__(self, index: ScheduleIndex):
+        keyed = []
+        for (group, week, day), d in index.days.items():
+            for r in d.pairs:
+                keyed.append(((group, WEEK_KEYS.index(week), UA_DAYS.index(day), r.pair), d, r))
+        keyed.sort(key=lambda x: x[0])
+
+        self._entries: List[Tuple[DayIndex, PairRecord]] = [(d, r) for _, d, r in keyed]
+        self._norm: List[str] = []
+        by_token: Dict[str, set] = {}
+        for i, (d, r) in enumerate(self._entries):
+            norm = normalize(" ".join((r.subject, r.teacher or "", r.room or "", d.group)))
+            self._norm.append(norm)
+            for tok in norm.split():
+                by_token.setdefault(tok, set()).add(i)
+
+        # різних слів у розкладі небагато — префікси й триграми рахуємо по словах, не по парах
+        prefixes: Dict[str, set] = {}
+        trigrams: Dict[str, set] = {}
+        for tok, ids in by_token.items():
+            for n in range(1, min(len(tok), MAX_PREFIX) + 1):
+                prefixes.setdefault(tok[:n], set()).update(ids)
+            for tg in _trigrams(tok):
+                trigrams.setdefault(tg, set()).update(ids)
+        self._prefixes: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in prefixes.items()}
+        self._trigrams: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in trigrams.items()}
+        self._cache: Dict[str, Tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit(self, i: int) -> SearchHit:
+        return SearchHit(*self._entries[i])
+
+    def _token(self, tok: str) -> FrozenSet[int]:
+        found = self._prefixes.get(tok[:MAX_PREFIX])
+        if found is not None:
+            if len(tok) <= MAX_PREFIX:
+                return found
+            return frozenset(i for i in found if tok in self._norm[i])
+        grams = _trigrams(tok)
+        if not grams:
+            return frozenset()
+        ids = None
+        for tg in sorted(grams, key=lambda g: len(self._trigrams.get(g, ()))):
+            part = self._trigrams.get(tg)
+            if not part:
+                return frozenset()
+            ids = part if ids is None else ids & part
+        return frozenset(i for i in ids if tok in self._norm[i])
+
+    def search(self, query: str) -> Tuple[int, ...]:
+        """Номери збігів у порядку група → тиждень → день → пара."""
+        key = normalize(query)
+        out = self._cache.get(key)
+        if out is None:
+            if len(self._cache) >= MAX_CACHED:
+                self._cache.clear()
+            out = self._cache[key] = self._search(key)
+        return out
+
+    def _search(self, norm: str) -> Tuple[int, ...]:
+        ids = None
+        for tok in sorted(set(norm.split()), key=len, reverse=True):
+            found = self._token(tok)
+            ids = found if ids is None else ids & found
+            if not ids:
+                return ()
+        return tuple(sorted(ids)) if ids else ()
@@ -0,0 +1,46 @@
+# snapshot.py — знімок скомпільованого стану між рестартами: pickle + перевірка джерел
+import hashlib, pickle, struct, sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from storage import atomic_write_bytes
+
+MAGIC = b"TGBSNAP\0"
+SNAPSHOT_VERSION = 1  # міняти, коли змінюється склад state
+_HEADER = struct.Struct("<8sH32s")  # magic, версія, sha256 payload
+
+def code_fingerprint(paths: Iterable[Path]) -> str:
+    """Хеш коду, від якого залежать запіклені обʼєкти: інший деплой — інший знімок."""
+    h = hashlib.sha256(f"{SNAPSHOT_VERSION}:{sys.version}".encode())
+    for p in paths:
+        h.update(Path(p).read_bytes())
+    return h.hexdigest()
+
+def write_snapshot(path: Path, sources: Dict[str, Any], state: Dict[str, Any]) -> int:
+    """sources — версії файлів/коду, з яких state побудовано; → розмір файлу в байтах."""
+    payload = pickle.dumps({"sources": sources, "state": state}, protocol=pickle.HIGHEST_PROTOCOL)
+    body = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, hashlib.sha256(payload).digest()) + payload
+    atomic_write_bytes(Path(path), body)
+    return len(body)
+
+def read_snapshot(path: Path, sources: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """state, якщо знімок цілий, тієї ж версії і з тих самих джерел; інакше None."""
+    try:
+        body = Path(path).read_bytes()
+    except OSError:
+        return None
+    if len(body) < _HEADER.size:
+        return None
+    magic, version, digest = _HEADER.unpack_from(body)
+    if magic != MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    payload = memoryview(body)[_HEADER.size:]
+    if hashlib.sha256(payload).digest() != digest:
+        return None
+    try:
+        data = pickle.loads(payload)
+    except Exception:
+        return None
+    if data.get("sources") != sources:
+        return None
+    return data["state"]
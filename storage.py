@@ -0,0 +1,311 @@
+# storage.py — сховище стану бота: JSON-файли (як раніше) або SQLite у режимі WAL
+import os, json, sqlite3, tempfile, threading, time
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+SCHEDULE_KINDS = ("practical", "lecture", "bells", "groups", "overrides")
+USER_FLAGS = ("notify_hour_before", "notify_5min_before")
+
+# ── JSON HELPERS ────────────────────────────────────────────────────────────
+def _atomic_write(p: Path, mode: str, write) -> None:
+    # temp-файл у тій самій теці + os.replace → файл або старий, або новий, але не битий
+    fd, tmp = tempfile.mkstemp(prefix=f".{p.name}.", suffix=".tmp", dir=str(p.parent))
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, p)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def atomic_write_json(p: Path, data: Any) -> None:
+    _atomic_write(p, "w", lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+
+def atomic_write_bytes(p: Path, data: bytes) -> None:
+    _atomic_write(p, "wb", lambda f: f.write(data))
+
+def file_version(p: Path) -> Optional[Tuple[int, int]]:
+    # (mtime_ns, size) — дешева ознака «файл змінився», без читання вмісту
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def read_json(p: Path, default: Any = None) -> Any:
+    if not p.exists():
+        return default
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return default
+
+def read_legacy_state(p: Path) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Старий state.json → (global, {chat_id: прапорці}) або None."""
+    legacy = read_json(p)
+    if not isinstance(legacy, dict):
+        return None
+    g = {
+        "week": legacy.get("week", "practical"),
+        "auto_rotate": legacy.get("auto_rotate", True),
+    }
+    users: Dict[str, Any] = {}
+    if legacy.get("chat_id") is not None:
+        users[str(legacy["chat_id"])] = {
+            "notify_hour_before": legacy.get("notify_hour_before", False),
+            "notify_5min_before": legacy.get("notify_5min_before", False),
+        }
+    return g, users
+
+# ── JSON BACKEND ────────────────────────────────────────────────────────────
+class JsonStorage:
+    name = "json"
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.users_file = data_dir / "users.json"
+        self.global_file = data_dir / "global.json"
+
+    def schedule_file(self, kind: str) -> Path:
+        # groups — багатогруповий розклад у форматі schedule.json
+        return self.data_dir / f"{kind}.json"
+
+    def load_users(self) -> Dict[str, Any]:
+        d = read_json(self.users_file, {})
+        return d if isinstance(d, dict) else {}
+
+    def save_users(self, users: Dict[str, Any], dirty: Optional[Iterable[str]] = None) -> None:
+        # JSON не вміє писати рядок — завжди переписуємо файл цілком
+        atomic_write_json(self.users_file, users)
+
+    def users_version(self) -> Any:
+        return file_version(self.users_file)
+
+    def load_global(self) -> Optional[Dict[str, Any]]:
+        d = read_json(self.global_file)
+        return d if isinstance(d, dict) else None
+
+    def save_global(self, state: Dict[str, Any]) -> None:
+        atomic_write_json(self.global_file, state)
+
+    def load_schedule(self, kind: str) -> Any:
+        p = self.schedule_file(kind)
+        if not p.exists():
+            return {}
+        with p.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_schedule(self, kind: str, data: Any) -> None:
+        atomic_write_json(self.schedule_file(kind), data)
+
+    def schedule_version(self, kind: str) -> Any:
+        return file_version(self.schedule_file(kind))
+
+    def export_schedule(self, kind: str) -> Optional[bytes]:
+        p = self.schedule_file(kind)
+        return p.read_bytes() if p.exists() else None
+
+    # службовий стан (черга автовидалення тощо): data/{name}.json
+    def load_state(self, name: str, default: Any = None) -> Any:
+        return read_json(self.data_dir / f"{name}.json", default)
+
+    def save_state(self, name: str, data: Any) -> None:
+        atomic_write_json(self.data_dir / f"{name}.json", data)
+
+    def close(self) -> None:
+        pass
+
+# ── SQLITE BACKEND ──────────────────────────────────────────────────────────
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    chat_id            INTEGER PRIMARY KEY,
+    notify_hour_before INTEGER NOT NULL DEFAULT 0,
+    notify_5min_before INTEGER NOT NULL DEFAULT 0,
+    extra              TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_hour ON users(notify_hour_before) WHERE notify_hour_before = 1;
+CREATE INDEX IF NOT EXISTS idx_users_5min ON users(notify_5min_before) WHERE notify_5min_before = 1;
+CREATE TABLE IF NOT EXISTS documents (
+    name       TEXT PRIMARY KEY,
+    body       TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+class SqliteStorage:
+    name = "sqlite"
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SQLITE_SCHEMA)
+
+    # users ------------------------------------------------------------------
+    @staticmethod
+    def _row(chat_id: str, u: Dict[str, Any]) -> Tuple[int, int, int, Optional[str]]:
+        extra = {k: v for k, v in u.items() if k not in USER_FLAGS}
+        return (
+            int(chat_id),
+            int(bool(u.get("notify_hour_before", False))),
+            int(bool(u.get("notify_5min_before", False))),
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+
+    def load_users(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT chat_id, notify_hour_before, notify_5min_before, extra FROM users"
+            ).fetchall()
+        for chat_id, hour, five, extra in rows:
+            u: Dict[str, Any] = {"notify_hour_before": bool(hour), "notify_5min_before": bool(five)}
+            if extra:
+                u.update(json.loads(extra))
+            out[str(chat_id)] = u
+        return out
+
+    def save_users(self, users: Dict[str, Any], dirty: Optional[Iterable[str]] = None) -> None:
+        upsert = (
+            "INSERT INTO users(chat_id, notify_hour_before, notify_5min_before, extra) VALUES (?,?,?,?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET notify_hour_before=excluded.notify_hour_before, "
+            "notify_5min_before=excluded.notify_5min_before, extra=excluded.extra"
+        )
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                if dirty is None:
+                    # повна синхронізація: upsert усіх + видалення зниклих
+                    self._db.execute("CREATE TEMP TABLE IF NOT EXISTS _keep(chat_id INTEGER PRIMARY KEY)")
+                    self._db.execute("DELETE FROM _keep")
+                    self._db.executemany("INSERT INTO _keep VALUES (?)", ((int(k),) for k in users))
+                    self._db.execute("DELETE FROM users WHERE chat_id NOT IN (SELECT chat_id FROM _keep)")
+                    self._db.executemany(upsert, (self._row(k, v) for k, v in users.items()))
+                else:
+                    for k in dirty:
+                        u = users.get(k)
+                        if u is None:
+                            self._db.execute("DELETE FROM users WHERE chat_id = ?", (int(k),))
+                        else:
+                            self._db.execute(upsert, self._row(k, u))
+                # позначка для users_version(): рядки users своєї дати зміни не мають
+                self._db.execute(
+                    "INSERT INTO documents(name, body, updated_at) VALUES ('users:version', '', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET updated_at=excluded.updated_at",
+                    (time.time(),),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def users_version(self) -> Any:
+        with self._lock:
+            row = self._db.execute("SELECT updated_at FROM documents WHERE name = 'users:version'").fetchone()
+        return row[0] if row else None
+
+    # documents (global + розклади) -------------------------------------------
+    def _get_doc(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _put_doc(self, name: str, data: Any) -> None:
+        body = json.dumps(data, ensure_ascii=False, indent=2)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO documents(name, body, updated_at) VALUES (?,?,?) "
+                "ON CONFLICT(name) DO UPDATE SET body=excluded.body, updated_at=excluded.updated_at",
+                (name, body, time.time()),
+            )
+
+    def load_global(self) -> Optional[Dict[str, Any]]:
+        body = self._get_doc("global")
+        return json.loads(body) if body else None
+
+    def save_global(self, state: Dict[str, Any]) -> None:
+        self._put_doc("global", state)
+
+    def load_schedule(self, kind: str) -> Any:
+        body = self._get_doc(kind)
+        return json.loads(body) if body else {}
+
+    def save_schedule(self, kind: str, data: Any) -> None:
+        self._put_doc(kind, data)
+
+    def schedule_version(self, kind: str) -> Any:
+        with self._lock:
+            row = self._db.execute("SELECT updated_at FROM documents WHERE name = ?", (kind,)).fetchone()
+        return row[0] if row else None
+
+    def export_schedule(self, kind: str) -> Optional[bytes]:
+        body = self._get_doc(kind)
+        return body.encode("utf-8") if body else None
+
+    def load_state(self, name: str, default: Any = None) -> Any:
+        body = self._get_doc(f"state:{name}")
+        return json.loads(body) if body else default
+
+    def save_state(self, name: str, data: Any) -> None:
+        self._put_doc(f"state:{name}", data)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            n_users = self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            n_docs = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return n_users == 0 and n_docs == 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+# ── IMPORT / FACTORY ────────────────────────────────────────────────────────
+def import_json(data_dir: Path, dst: SqliteStorage) -> Dict[str, int]:
+    """Одноразовий перенос data/*.json (включно зі старим state.json) у SQLite."""
+    src = JsonStorage(data_dir)
+    users = src.load_users()
+    g = src.load_global()
+    legacy_file = data_dir / "state.json"
+    legacy = read_legacy_state(legacy_file)
+    if legacy is not None:
+        lg, lusers = legacy
+        g = lg
+        users.update(lusers)
+    stats = {"users": len(users), "schedules": 0}
+    dst.save_users(users)
+    if g is not None:
+        dst.save_global(g)
+    for kind in SCHEDULE_KINDS:
+        if src.schedule_file(kind).exists():
+            dst.save_schedule(kind, src.load_schedule(kind))
+            stats["schedules"] += 1
+    if legacy is not None:
+        legacy_file.unlink(missing_ok=True)
+    return stats
+
+def open_storage(backend: str, data_dir: Path, db_path: Optional[Path] = None):
+    backend = (backend or "json").lower()
+    if backend == "json":
+        return JsonStorage(data_dir)
+    if backend == "sqlite":
+        st = SqliteStorage(db_path or data_dir / "bot.sqlite3")
+        if st.is_empty():
+            import_json(data_dir, st)  # перший запуск на SQLite — підтягнемо JSON
+        return st
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+if __name__ == "__main__":
+    # python storage.py [data_dir] [db_path] — примусовий імпорт JSON → SQLite
+    import sys
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "data"
+    db_path = Path(sys.argv[2]) if len(sys.argv) > 2 else data_dir / "bot.sqlite3"
+    st = SqliteStorage(db_path)
+    print(import_json(data_dir, st))
+    st.close()
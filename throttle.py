@@ -0,0 +1,60 @@
+# throttle.py — захист від флуду кнопками: ліміт на чат і злиття повторних натискань
+import asyncio, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class ChatRateLimiter:
+    """
+    Відро токенів на кожен chat_id: rate апдейтів/с, запас burst.
+    Синхронне й без очікування — зайве просто відкидається. Тримає не більше
+    max_chats відер (LRU), тож ферма нових акаунтів памʼять не розганяє.
+    """
+
+    def __init__(self, rate: float, burst: float, max_chats: int = 50_000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_chats = max_chats
+        self._buckets: "OrderedDict[int, Tuple[float, float]]" = OrderedDict()
+
+    def allow(self, chat_id: int) -> bool:
+        now = time.monotonic()
+        tokens, ts = self._buckets.pop(chat_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - ts) * self.rate)
+        ok = tokens >= 1
+        self._buckets[chat_id] = (tokens - 1 if ok else tokens, now)
+        if len(self._buckets) > self.max_chats:
+            self._buckets.popitem(last=False)
+        return ok
+
+FlushFunc = Callable[[Hashable, Any, int], Awaitable[None]]
+
+class Coalescer:
+    """
+    Перше натискання за ключем проходить одразу й відкриває вікно на window секунд;
+    повтори у вікні лише рахуються, а по його закінченні — один виклик
+    on_flush(key, payload останнього повтору, кількість повторів).
+    """
+
+    def __init__(self, window: float, on_flush: FlushFunc):
+        self.window = window
+        self.on_flush = on_flush
+        self._open: Dict[Hashable, list] = {}  # key → [повторів, payload]
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def hit(self, key: Hashable, payload: Any) -> bool:
+        """True — обробити як звичайно; False — злито з попереднім натисканням."""
+        slot = self._open.get(key)
+        if slot is not None:
+            slot[0] += 1
+            slot[1] = payload
+            return False
+        self._open[key] = [0, payload]
+        asyncio.get_running_loop().call_later(self.window, self._close, key)
+        return True
+
+    def _close(self, key: Hashable) -> None:
+        repeats, payload = self._open.pop(key, (0, None))
+        if repeats:
+            asyncio.ensure_future(self.on_flush(key, payload, repeats))
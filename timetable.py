@@ -0,0 +1,241 @@
+# timetable.py — скомпільований індекс розкладу: відсортовані пари + готові тексти
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PAIR_EMOJI = {1:"1️⃣",2:"2️⃣",3:"3️⃣",4:"4️⃣",5:"5️⃣",6:"6️⃣",7:"7️⃣",8:"8️⃣"}
+UA_DAYS = ["Понеділок","Вівторок","Середа","Четвер","Пʼятниця","Субота","Неділя"]
+WEEK_KEYS = ("practical", "lecture")
+DEFAULT_GROUP = ""  # розклад із practical.json / lecture.json
+REMINDER_HEADS = {
+    "hour": "⏰ Нагадування: за 1 год до першої пари",
+    "5min": "⌛ Нагадування: за 5 хв до пари",
+}
+
+_BELL_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+def parse_bell_start(bell_val: str) -> Tuple[int,int]:
+    # "09:00-10:20" -> (9,0)
+    m = _BELL_RE.match(bell_val)
+    if not m:
+        raise ValueError(f"Bad bell time: {bell_val}")
+    return int(m.group(1)), int(m.group(2))
+
+def parse_bell_range(bell_val: str) -> Tuple[int,int]:
+    # "09:00-10:20" -> (540, 620) — хвилини від півночі
+    m = _BELL_RE.match(bell_val)
+    if not m:
+        raise ValueError(f"Bad bell time: {bell_val}")
+    return int(m.group(1)) * 60 + int(m.group(2)), int(m.group(3)) * 60 + int(m.group(4))
+
+def parse_hhmm(v: str) -> int:
+    # "09:00" -> 540
+    h, m = str(v).strip().split(":")
+    return int(h) * 60 + int(m)
+
+def week_label(week_key: str) -> str:
+    return "Лекційний" if week_key == "lecture" else "Практичний"
+
+def pair_emoji(p: int) -> str:
+    return PAIR_EMOJI.get(p, str(p))
+
+# ── RECORDS ─────────────────────────────────────────────────────────────────
+class PairRecord:
+    __slots__ = ("pair", "subject", "teacher", "room", "hours", "start", "end",
+                 "brief", "detailed", "text", "reminders")
+
+    def __init__(self, pair: int, subject: str, teacher: str, room: str, hours: Optional[str]):
+        self.pair = pair
+        self.subject = subject
+        self.teacher = teacher
+        self.room = room
+        self.hours = hours
+        self.start: Optional[int] = None  # хвилини від півночі
+        self.end: Optional[int] = None
+        if hours:
+            try:
+                self.start, self.end = parse_bell_range(hours)
+            except ValueError:
+                pass
+
+        e = pair_emoji(pair)
+        time_str = f"\n🕒 {hours}" if hours else ""
+        teacher_str = f"\n👨‍🏫 {teacher}" if teacher else ""
+        self.brief = f"{e} <b>{subject}</b> — {room}"
+        self.detailed = f"{e} <b>{subject}</b>{time_str}\n🚪 {room}{teacher_str}"
+        room_str = f"\n🚪 {room}" if room else ""
+        self.text = f"{e} <b>{subject}</b>{time_str}{room_str}{teacher_str}"
+        self.reminders = {k: f"{head}\n\n{self.text}" for k, head in REMINDER_HEADS.items()}
+
+    @classmethod
+    def from_legacy(cls, it: Dict[str, Any], bells: Dict[str, str]) -> "PairRecord":
+        # {"pair": 5, "subject": ..., "teacher": ..., "room": ...} + час із bells.json
+        pair = int(it.get("pair", 0))
+        return cls(pair, it.get("subject", ""), it.get("teacher", ""), it.get("room", ""),
+                   bells.get(str(pair)))
+
+    @classmethod
+    def from_group(cls, it: Dict[str, Any], pair: int) -> "PairRecord":
+        # {"start": "15:20", "end": "16:40", "title": ..., "teacher": ..., "room": ...}
+        hours = f"{it.get('start', '')}-{it.get('end', '')}" if it.get("start") and it.get("end") else None
+        return cls(pair, it.get("title", ""), it.get("teacher", ""), it.get("room", ""), hours)
+
+class DayIndex:
+    __slots__ = ("group", "week", "day", "pairs", "note", "by_pair", "first_pair", "brief", "detailed")
+
+    def __init__(self, week: str, day: str, pairs: Tuple[PairRecord, ...], group: str = DEFAULT_GROUP,
+                 note: str = ""):
+        self.group = group
+        self.week = week
+        self.day = day
+        self.pairs = pairs
+        self.note = note  # винятки на конкретну дату (overrides.py)
+        self.by_pair: Dict[int, PairRecord] = {}
+        for r in pairs:
+            self.by_pair.setdefault(r.pair, r)  # як і раніше — перша пара з таким номером
+        self.first_pair: Optional[int] = pairs[0].pair if pairs else None
+        head = f"📆 <b>{day}</b> • {week_label(week)} тиждень"
+        if group:
+            head += f" • {group}"
+        if note:
+            head += f"\n📌 {note}"
+        if not pairs:
+            self.brief = self.detailed = f"{head}\n— пар немає 🙂"
+        else:
+            self.brief = "\n\n".join([head] + [r.brief for r in pairs])
+            self.detailed = "\n\n".join([head] + [r.detailed for r in pairs])
+
+    def pair_text(self, pair_num: int) -> str:
+        r = self.by_pair.get(pair_num)
+        return r.text if r else f"{pair_emoji(pair_num)} Пара №{pair_num}"
+
+    def reminder_text(self, kind: str, pair_num: int) -> str:
+        r = self.by_pair.get(pair_num)
+        return r.reminders[kind] if r else f"{REMINDER_HEADS[kind]}\n\n{self.pair_text(pair_num)}"
+
+# ── INDEX ───────────────────────────────────────────────────────────────────
+BELL_MATCH_MINUTES = 20  # наскільки початок пари може відхилятися від дзвінка
+
+def bell_starts(bells: Dict[str, str]) -> List[Tuple[int, int]]:
+    """[(хвилина початку, номер пари)] з bells.json; биті рядки пропускаємо."""
+    out = []
+    for k, v in bells.items():
+        try:
+            out.append((parse_bell_range(v)[0], int(k)))
+        except ValueError:
+            pass
+    return out
+
+def group_day_records(items: List[Dict[str, Any]], bell_starts: List[Tuple[int, int]]) -> List[PairRecord]:
+    # номер пари — явний "pair", інакше за найближчим дзвінком із bells.json, інакше порядковий у дні
+    items = sorted(items or (), key=lambda it: parse_hhmm(it.get("start", "99:99")))
+    out = []
+    for i, it in enumerate(items, 1):
+        pair = i
+        if it.get("pair") is not None:
+            out.append(PairRecord.from_group(it, int(it["pair"])))
+            continue
+        try:
+            start = parse_hhmm(it["start"])
+            diff, num = min(((abs(b - start), n) for b, n in bell_starts), default=(None, None))
+            if diff is not None and diff <= BELL_MATCH_MINUTES:
+                pair = num
+        except (KeyError, ValueError):
+            pass
+        out.append(PairRecord.from_group(it, pair))
+    return out
+
+class ScheduleIndex:
+    """Незмінний після побудови; замінюється цілком при оновленні розкладу."""
+    __slots__ = ("bells", "bells_text", "days", "groups")
+
+    def __init__(self, weeks: Dict[str, Any], bells: Dict[str, str],
+                 groups: Optional[Dict[str, Any]] = None):
+        self.bells = dict(bells or {})
+        self.bells_text = render_bells(self.bells)
+        self.days: Dict[Tuple[str, str, str], DayIndex] = {}
+        for week in WEEK_KEYS:
+            for day, items in (weeks.get(week) or {}).items():
+                recs = [PairRecord.from_legacy(it, self.bells) for it in items or ()]
+                recs.sort(key=lambda r: r.pair)
+                self.days[(DEFAULT_GROUP, week, day)] = DayIndex(week, day, tuple(recs))
+
+        # schedule.json: groups → назва → practical/lecture → "1".."7" → [{start, end, title, ...}]
+        starts = bell_starts(self.bells)
+        names = []
+        for name, weeks_g in (groups or {}).items():
+            if not name:
+                continue
+            names.append(name)
+            for week in WEEK_KEYS:
+                for wd, items in ((weeks_g or {}).get(week) or {}).items():
+                    day = UA_DAYS[int(wd) - 1]
+                    recs = group_day_records(items, starts)
+                    self.days[(name, week, day)] = DayIndex(week, day, tuple(recs), name)
+        self.groups: Tuple[str, ...] = tuple(sorted(names))
+
+    def day(self, week: str, day: str, group: str = DEFAULT_GROUP) -> DayIndex:
+        d = self.days.get((group, week, day))
+        if d is None:
+            d = DayIndex(week, day, (), group)
+        return d
+
+    def has_group(self, group: str) -> bool:
+        return group == DEFAULT_GROUP or group in self.groups
+
+def render_bells(bells: Dict[str, str]) -> str:
+    if not bells:
+        return "🔔 Розклад дзвінків ще не завантажено."
+    lines = ["🔔 <b>Розклад дзвінків</b>"]
+    for k in sorted(bells.keys(), key=lambda x: int(x)):
+        lines.append(f"{PAIR_EMOJI.get(int(k), k)} {bells[k]}")
+    return "\n".join(lines)
+
+# ── CALENDAR ────────────────────────────────────────────────────────────────
+REMINDER_OFFSETS = {"hour": 60, "5min": 5}  # за скільки хвилин до пари
+SlotEntry = Tuple[str, str, int]                           # (група, тип, пара)
+CalendarSlot = Tuple[float, str, str, Tuple[SlotEntry, ...]]  # (ts, тиждень, день, записи)
+
+DayOf = Callable[[date, str, str], DayIndex]  # (дата, тиждень, група) → день із винятками
+
+def day_slots(index: ScheduleIndex, week: str, day: str,
+              day_of: Optional[Callable[[str], DayIndex]] = None) -> Dict[int, List[SlotEntry]]:
+    """{хвилина доби: [(група, тип, пара)]} — усі нагадування одного дня для всіх груп."""
+    out: Dict[int, List[SlotEntry]] = {}
+
+    def add(minutes: int, entry: SlotEntry):
+        if minutes < 0:
+            return
+        entries = out.setdefault(minutes, [])
+        if entry not in entries:
+            entries.append(entry)
+
+    for group in (DEFAULT_GROUP,) + index.groups:
+        d = day_of(group) if day_of else index.day(week, day, group)
+        if not d.pairs:
+            continue
+        # За 1 годину до першої
+        first = d.by_pair[d.first_pair]
+        if first.start is not None:
+            add(first.start - REMINDER_OFFSETS["hour"], (group, "hour", first.pair))
+        # За 5 хв до кожної пари
+        for r in d.pairs:
+            if r.start is not None:
+                add(r.start - REMINDER_OFFSETS["5min"], (group, "5min", r.pair))
+    return out
+
+def materialize_calendar(index: ScheduleIndex, tz, first: date, days: int,
+                         week_of: Callable[[date], str], day_of: Optional[DayOf] = None) -> List[CalendarSlot]:
+    """
+    Відсортований за часом список слотів на days днів, починаючи з first (tz — pytz).
+    day_of — день розкладу на конкретну дату (винятки); без нього — лише за днем тижня.
+    """
+    out: List[CalendarSlot] = []
+    for i in range(days):
+        d = first + timedelta(days=i)
+        week, day = week_of(d), UA_DAYS[d.weekday()]
+        dated = (lambda group, d=d, week=week: day_of(d, week, group)) if day_of else None
+        for minutes, entries in sorted(day_slots(index, week, day, dated).items()):
+            local = tz.localize(datetime(d.year, d.month, d.day, minutes // 60, minutes % 60))
+            out.append((local.timestamp(), week, day, tuple(entries)))
+    return out
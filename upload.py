@@ -0,0 +1,325 @@
+# upload.py — прийом розкладу від адміна: ліміт розміру, скомпільована схема, злиття груп, diff
+import io, json
+from datetime import date
+from typing import Any, Callable, Dict, List, Tuple
+
+from timetable import (UA_DAYS, WEEK_KEYS, bell_starts, group_day_records, parse_bell_range, parse_bell_start,
+                       parse_hhmm)
+
+MAX_ERRORS = 10  # більше адміну в одному повідомленні не прочитати
+MAX_OVERRIDE_DAYS = 366  # довший виняток — майже напевно помилка в році
+# кнопка вибору групи несе назву в callback_data "settings:group:<назва>", а Telegram
+# приймає до 64 байт — інакше відхиляє всю клавіатуру (BUTTON_DATA_INVALID)
+MAX_GROUP_NAME_BYTES = 64 - len("settings:group:")
+
+class UploadError(ValueError):
+    """Файл відхилено; текст — для відповіді адміну."""
+
+class LimitedBuffer(io.BytesIO):
+    """Приймач для download_file: обриває завантаження, щойно перевищено limit байтів."""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, b) -> int:
+        if self.tell() + len(b) > self.limit:
+            raise UploadError(f"Файл більший за {self.limit // 1024} КБ")
+        return super().write(b)
+
+# ── SCHEMA ──────────────────────────────────────────────────────────────────
+# Специфікація → дерево замикань один раз при імпорті; перевірка — без інтерпретації спеки.
+#   str / int            — тип значення
+#   (check, "опис")      — довільна перевірка скаляра: check(v) кидає ValueError
+#   [spec]               — список елементів spec
+#   {"поле": spec, "поле?": spec} — обʼєкт, «?» — необовʼязкове, зайві поля дозволені
+#   Keys(key_check, spec) — словник із довільними ключами
+#   OrNull(spec)         — spec або null
+Check = Callable[[Any, str, List[str]], None]
+
+class Keys:
+    def __init__(self, key: Tuple[Callable[[str], Any], str], value: Any):
+        self.key = key
+        self.value = value
+
+class OrNull:
+    def __init__(self, spec: Any):
+        self.spec = spec
+
+_TYPE_NAMES = {str: "рядок", int: "ціле число", dict: "обʼєкт", list: "список"}
+
+def _err(errors: List[str], path: str, msg: str) -> None:
+    if len(errors) < MAX_ERRORS:
+        errors.append(f"{path or '/'}: {msg}")
+
+def _compile(spec: Any) -> Check:
+    if spec is str or spec is int:
+        def check_type(v, path, errors):
+            if not isinstance(v, spec) or isinstance(v, bool):
+                _err(errors, path, f"очікується {_TYPE_NAMES[spec]}")
+        return check_type
+
+    if isinstance(spec, tuple):
+        func, what = spec
+
+        def check_scalar(v, path, errors):
+            try:
+                func(v)
+            except (TypeError, ValueError, AttributeError):
+                _err(errors, path, f"очікується {what}, отримано {v!r}")
+        return check_scalar
+
+    if isinstance(spec, list):
+        item = _compile(spec[0])
+
+        def check_list(v, path, errors):
+            if not isinstance(v, list):
+                return _err(errors, path, "очікується список")
+            for i, it in enumerate(v):
+                item(it, f"{path}[{i}]", errors)
+        return check_list
+
+    if isinstance(spec, Keys):
+        (key_func, key_what), value = spec.key, _compile(spec.value)
+
+        def check_keys(v, path, errors):
+            if not isinstance(v, dict):
+                return _err(errors, path, "очікується обʼєкт")
+            for k, it in v.items():
+                try:
+                    key_func(k)
+                except (TypeError, ValueError):
+                    _err(errors, f"{path}/{k}", f"ключ має бути {key_what}")
+                    continue
+                value(it, f"{path}/{k}", errors)
+        return check_keys
+
+    if isinstance(spec, OrNull):
+        inner = _compile(spec.spec)
+
+        def check_or_null(v, path, errors):
+            if v is not None:
+                inner(v, path, errors)
+        return check_or_null
+
+    if isinstance(spec, dict):
+        fields = [(name.rstrip("?"), not name.endswith("?"), _compile(sub)) for name, sub in spec.items()]
+
+        def check_obj(v, path, errors):
+            if not isinstance(v, dict):
+                return _err(errors, path, "очікується обʼєкт")
+            for name, required, sub in fields:
+                if name in v:
+                    if v[name] is not None or required:
+                        sub(v[name], f"{path}/{name}", errors)
+                elif required:
+                    _err(errors, path, f"немає поля '{name}'")
+        return check_obj
+
+    raise TypeError(f"bad schema spec: {spec!r}")
+
+def _day_name(v):
+    if v not in UA_DAYS:
+        raise ValueError(v)
+
+def _group_name(v):
+    if not str(v).strip() or len(str(v).encode("utf-8")) > MAX_GROUP_NAME_BYTES:
+        raise ValueError(v)
+
+def _week_key(v):
+    if v not in WEEK_KEYS:
+        raise ValueError(v)
+
+def _weekday_num(v):
+    if not 1 <= int(v) <= 7:
+        raise ValueError(v)
+
+def _pair_num(v):
+    if isinstance(v, bool) or int(v) < 1:
+        raise ValueError(v)
+
+def _bell(v):
+    parse_bell_start(v)
+    start, end = parse_bell_range(v)
+    if not 0 <= start < end < 24 * 60:
+        raise ValueError(v)
+
+def _hhmm(v):
+    if not 0 <= parse_hhmm(v) < 24 * 60:
+        raise ValueError(v)
+
+def _iso_date(v):
+    date.fromisoformat(v)
+
+LEGACY_PAIR = {"pair": (_pair_num, "номер пари"), "subject": str, "teacher?": str, "room?": str}
+GROUP_PAIR = {"start": (_hhmm, "час HH:MM"), "end?": (_hhmm, "час HH:MM"), "title": str,
+              "teacher?": str, "room?": str, "pair?": (_pair_num, "номер пари")}
+GROUP_WEEKS = Keys((_week_key, "practical або lecture"), Keys((_weekday_num, "день 1..7"), [GROUP_PAIR]))
+PAIR_KEY = (_pair_num, "номер пари")
+GROUP_KEY = (_group_name, f"непорожня назва групи до {MAX_GROUP_NAME_BYTES} байт")
+OVERRIDE = {"from": (_iso_date, "дата YYYY-MM-DD"), "to?": (_iso_date, "дата YYYY-MM-DD"),
+            "group?": GROUP_KEY, "note?": str,
+            "holiday?": str, "cancel?": [PAIR_KEY], "move?": Keys(PAIR_KEY, PAIR_KEY),
+            "replace?": Keys(PAIR_KEY, {"subject": str, "teacher?": str, "room?": str,
+                                        "hours?": (_bell, "час HH:MM-HH:MM")}),
+            "as?": (_day_name, "назва дня"), "week?": (_week_key, "practical або lecture")}
+OVERRIDE_ACTIONS = ("holiday", "cancel", "move", "replace", "as", "week")
+
+SCHEMAS: Dict[str, Check] = {
+    "practical": _compile(Keys((_day_name, "назва дня"), [LEGACY_PAIR])),
+    "lecture":   _compile(Keys((_day_name, "назва дня"), [LEGACY_PAIR])),
+    "bells":     _compile(Keys((_pair_num, "номер пари"), (_bell, "час HH:MM-HH:MM"))),
+    "groups":    _compile({"groups": Keys(GROUP_KEY, GROUP_WEEKS)}),
+    # злиття з наявними групами: "назва": null видаляє групу
+    "groups_merge": _compile({"groups": Keys(GROUP_KEY, OrNull(GROUP_WEEKS))}),
+    "overrides": _compile({"overrides": [OVERRIDE]}),
+}
+UPLOAD_KINDS = tuple(SCHEMAS)
+
+# ── SEMANTIC CHECKS ─────────────────────────────────────────────────────────
+def _check_legacy(week: str, data: Dict[str, Any], bells: Dict[str, str], errors: List[str]) -> None:
+    for day, items in data.items():
+        seen = set()
+        for it in items:
+            p = int(it["pair"])
+            if str(p) not in bells:
+                _err(errors, f"{week}/{day}", f"пари {p} немає в bells.json")
+            if p in seen:
+                _err(errors, f"{week}/{day}", f"пара {p} двічі")
+            seen.add(p)
+
+def _check_groups(groups: Dict[str, Any], bells: Dict[str, str], errors: List[str]) -> None:
+    starts_of_bells = bell_starts(bells)
+    for name, weeks in groups.items():
+        for week, days in (weeks or {}).items():
+            for wd, items in days.items():
+                path = f"{name}/{week}/{wd}"
+                starts = set()
+                for it in items:
+                    start = parse_hhmm(it["start"])
+                    if it.get("end") and parse_hhmm(it["end"]) <= start:
+                        _err(errors, path, f"{it['start']}: кінець раніше початку")
+                    if start in starts:
+                        _err(errors, path, f"дві пари о {it['start']}")
+                    starts.add(start)
+                    if it.get("pair") is not None and str(int(it["pair"])) not in bells:
+                        _err(errors, path, f"пари {int(it['pair'])} немає в bells.json")
+                # дублікати — за тією ж нумерацією, що й індекс (явна / за дзвінком / порядкова)
+                pairs = set()
+                for r in group_day_records(items, starts_of_bells):
+                    if r.pair in pairs:
+                        _err(errors, path, f"пара {r.pair} двічі ({r.hours or r.subject})")
+                    pairs.add(r.pair)
+
+def _check_overrides(items: List[Dict[str, Any]], bells: Dict[str, str], groups: Dict[str, Any],
+                     errors: List[str]) -> None:
+    for i, it in enumerate(items):
+        path = f"overrides[{i}]"
+        first = date.fromisoformat(it["from"])
+        last = date.fromisoformat(it["to"]) if it.get("to") else first
+        if last < first:
+            _err(errors, path, "to раніше за from")
+        elif (last - first).days >= MAX_OVERRIDE_DAYS:
+            _err(errors, path, f"довше за {MAX_OVERRIDE_DAYS} днів")
+        if not any(it.get(a) is not None for a in OVERRIDE_ACTIONS):
+            _err(errors, path, "немає жодної дії: " + ", ".join(OVERRIDE_ACTIONS))
+        if it.get("group") is not None and it["group"] not in groups:
+            _err(errors, path, f"групи {it['group']} немає в розкладі")
+        if it.get("week") and it.get("group") is not None:
+            _err(errors, path, "week діє лише на всі групи")
+        targets = [b for b in (it.get("move") or {}).values()]
+        targets += [p for p, v in (it.get("replace") or {}).items() if not v.get("hours")]
+        for p in targets:
+            if str(int(p)) not in bells:
+                _err(errors, path, f"пари {p} немає в bells.json")
+
+def _override_label(it: Dict[str, Any]) -> str:
+    label = it["from"] + (f"…{it['to']}" if it.get("to") and it["to"] != it["from"] else "")
+    return label + (f" {it['group']}" if it.get("group") else "")
+
+# ── DIFF ────────────────────────────────────────────────────────────────────
+def _diff_keys(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, List[str]]:
+    old, new = old or {}, new or {}
+    return {
+        "added":   sorted(k for k in new if k not in old),
+        "removed": sorted(k for k in old if k not in new),
+        "changed": sorted(k for k in new if k in old and new[k] != old[k]),
+    }
+
+def diff_schedule(kind: str, old: Any, new: Any) -> Dict[str, List[str]]:
+    """{"added"|"removed"|"changed": [ключі]} — дні, номери пар або групи (для груп — з кількістю днів)."""
+    if kind in ("groups", "groups_merge"):
+        og, ng = (old or {}).get("groups") or {}, (new or {}).get("groups") or {}
+        d = _diff_keys(og, ng)
+        changed = []
+        for name in d["changed"]:
+            n = sum(len(_diff_keys((og[name] or {}).get(w), (ng[name] or {}).get(w))[k])
+                    for w in WEEK_KEYS for k in ("added", "removed", "changed"))
+            changed.append(f"{name} ({n} дн.)")
+        d["changed"] = changed
+        return d
+    if kind == "overrides":
+        label = lambda data: {_override_label(it): it for it in (data or {}).get("overrides") or ()}
+        return {k: sorted(v) for k, v in _diff_keys(label(old), label(new)).items()}
+    d = _diff_keys(old, new)
+    if kind == "bells":
+        order = lambda v: int(v) if v.isdigit() else 0
+    else:
+        order = lambda v: UA_DAYS.index(v) if v in UA_DAYS else len(UA_DAYS)
+    for k in d:
+        d[k].sort(key=order)
+    return d
+
+def format_diff(d: Dict[str, List[str]], limit: int = 8) -> str:
+    def part(sign: str, items: List[str]) -> str:
+        more = f" +{len(items) - limit}" if len(items) > limit else ""
+        return f"{sign} " + ", ".join(items[:limit]) + more
+    parts = [part(s, d[k]) for s, k in (("➕", "added"), ("✏️", "changed"), ("➖", "removed")) if d[k]]
+    return "\n".join(parts) if parts else "без змін у файлі"
+
+# ── PIPELINE ────────────────────────────────────────────────────────────────
+def prepare_upload(kind: str, raw: bytes, current: Dict[str, Any]) -> Tuple[str, Any, Dict[str, List[str]]]:
+    """
+    Для IO-потоку: bytes → (kind для збереження, дані, diff) або UploadError.
+    current — поточні розклади {practical, lecture, bells, groups, overrides}, лише читаються.
+    """
+    check = SCHEMAS.get(kind)
+    if check is None:
+        raise UploadError("Невідомий тип")
+    try:
+        data = json.loads(raw.decode("utf-8-sig"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise UploadError(f"Не JSON: {e}")
+
+    errors: List[str] = []
+    check(data, "", errors)
+    if not errors:
+        bells = data if kind == "bells" else (current.get("bells") or {})
+        if kind in ("practical", "lecture"):
+            _check_legacy(kind, data, bells, errors)
+        elif kind == "bells":
+            # нові дзвінки не мають «загубити» пари з чинного розкладу
+            try:
+                for week in WEEK_KEYS:
+                    _check_legacy(week, current.get(week) or {}, bells, errors)
+                _check_groups((current.get("groups") or {}).get("groups") or {}, bells, errors)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                pass  # чинний файл старого формату — його не перевіряли при завантаженні
+        elif kind == "overrides":
+            _check_overrides(data["overrides"], bells, (current.get("groups") or {}).get("groups") or {}, errors)
+        else:
+            _check_groups({k: v for k, v in data["groups"].items() if v is not None}, bells, errors)
+    if errors:
+        raise UploadError("\n".join(errors))
+
+    target = kind
+    if kind == "groups_merge":
+        target = "groups"
+        merged = dict((current.get("groups") or {}).get("groups") or {})
+        for name, weeks in data["groups"].items():
+            if weeks is None:
+                merged.pop(name, None)
+            else:
+                merged[name] = weeks
+        data = {**(current.get("groups") or {}), "groups": merged}
+    return target, data, diff_schedule(target, current.get(target), data)
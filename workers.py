@@ -0,0 +1,177 @@
+# workers.py — процеси-воркери розсилки нагадувань: кожен обслуговує свій шард chat_id % N
+import asyncio, json, logging, os, signal, subprocess, sys, time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.bot.api import TELEGRAM_PRODUCTION, TelegramAPIServer
+from aiogram.utils.exceptions import TelegramAPIError
+
+from autodelete import DeleteQueue
+from broadcast import Broadcaster, DeadChats
+from outbox import Outbox
+
+log = logging.getLogger("bot.worker")
+
+POLL_INTERVAL = 0.2   # сек між перевірками outbox, коли черга порожня
+DELETE_TICK = 15      # сек між проходами черги автовидалення
+
+class ReminderWorker:
+    def __init__(self, shard: int, shards: int, outbox_path: Path, token: str,
+                 rate: float, workers: int, autodelete_minutes: int, dead_threshold: int = 3,
+                 grace: float = 300.0):
+        self.shard = shard
+        self.shards = shards
+        self.outbox = Outbox(outbox_path)
+        server = os.getenv("BOT_API_SERVER", "")
+        self.bot = Bot(token=token, parse_mode="HTML",
+                       server=TelegramAPIServer.from_base(server) if server else TELEGRAM_PRODUCTION)
+        # глобальний ліміт Telegram — на токен, тож ділимо його між шардами;
+        # недосяжні чати віддаємо фронту через outbox — реєстр юзерів лише в ньому
+        self.dead = DeadChats(dead_threshold, self.outbox.report_dead)
+        self.broadcaster = Broadcaster(self.bot, rate=max(rate / shards, 1.0), workers=workers, dead=self.dead)
+        self.autodelete_seconds = autodelete_minutes * 60
+        self.deletes = DeleteQueue()
+        self.errors: Dict[str, int] = {}  # проковтнуті помилки з минулого проходу — у лог
+        self.grace = grace  # як REMINDER_GRACE у фронті: старіше завдання лише підтверджуємо
+        self.expired = 0
+
+    def _on_sent(self, chat_id: int, msg):
+        self.deletes.push(chat_id, msg.message_id, time.time() + self.autodelete_seconds)
+
+    async def _delete_chat(self, chat_id: int, ids: List[int]) -> None:
+        for i in range(0, len(ids), 100):
+            chunk = ids[i:i + 100]
+            await self.broadcaster.bucket.acquire()
+            if len(chunk) > 1:
+                try:
+                    await self.bot.request("deleteMessages", {"chat_id": chat_id, "message_ids": json.dumps(chunk)})
+                    continue
+                except (TelegramAPIError, asyncio.TimeoutError) as e:
+                    self._count_error("delete_batch", e)  # старий Bot API або частина вже видалена — поштучно нижче
+                    if self.dead.failed(chat_id, e):
+                        return
+            for mid in chunk:
+                try:
+                    await self.bot.delete_message(chat_id, mid)
+                except (TelegramAPIError, asyncio.TimeoutError) as e:
+                    self._count_error("delete_message", e)
+                    if self.dead.failed(chat_id, e):
+                        return  # чат недосяжний — решту його повідомлень не чіпаємо
+
+    def _count_error(self, where: str, exc: BaseException) -> None:
+        key = f"{where}:{type(exc).__name__}"
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    async def _drain_deletes(self):
+        due = self.deletes.drain_due()
+        for chat_id, ids in due.items():
+            await self._delete_chat(chat_id, ids)
+        if self.errors:
+            log.warning("shard %s: delete errors %s", self.shard, self.errors)
+            self.errors.clear()
+        if self.deletes.dirty:
+            self.outbox.save_state(self.shard, "autodelete", self.deletes.dump())
+            self.deletes.dirty = False
+
+    async def run(self, stop) -> None:
+        self.deletes.load(self.outbox.load_state(self.shard, "autodelete", []))
+        n = self.outbox.release_claimed(self.shard)  # після падіння — повернути недоставлене
+        if n:
+            log.warning("shard %s: re-queued %s unacked jobs", self.shard, n)
+        next_delete = 0.0
+        try:
+            while not stop.is_set():
+                if time.monotonic() >= next_delete:
+                    await self._drain_deletes()
+                    next_delete = time.monotonic() + DELETE_TICK
+                batch = self.outbox.claim(self.shard)
+                if not batch:
+                    await asyncio.sleep(POLL_INTERVAL)
+                    continue
+                for row_id, created, payload in batch:
+                    late = time.time() - created
+                    if late > self.grace:
+                        # після падіння воркера чи простою «за 5 хв» години потому вже шкодить
+                        self.expired += len(payload["chat_ids"])
+                        log.warning("shard %s %s: dropped, %.0fs late (expired total %s)",
+                                    self.shard, payload.get("tag", ""), late, self.expired)
+                        self.outbox.ack([row_id])
+                        continue
+                    stats = await self.broadcaster.broadcast(payload["chat_ids"], payload["text"], on_sent=self._on_sent)
+                    log.info("shard %s %s: %r", self.shard, payload.get("tag", ""), stats)
+                    self.outbox.ack([row_id])
+        finally:
+            self.outbox.save_state(self.shard, "autodelete", self.deletes.dump())
+            self.outbox.close()
+            await (await self.bot.get_session()).close()
+
+def worker_main(shard: int, shards: int, outbox_path: str) -> None:
+    """Точка входу процесу-воркера; SIGTERM/SIGINT — акуратна зупинка."""
+    logging.basicConfig(level=logging.INFO)
+    w = ReminderWorker(
+        shard, shards, Path(outbox_path),
+        token=os.environ["BOT_TOKEN"],
+        rate=float(os.getenv("BROADCAST_RATE", "25")),
+        workers=int(os.getenv("BROADCAST_WORKERS", "16")),
+        autodelete_minutes=int(os.getenv("AUTODELETE_MINUTES", "10")),
+        dead_threshold=int(os.getenv("DEAD_CHAT_THRESHOLD", "3")),
+        grace=float(os.getenv("REMINDER_GRACE", "300")),
+    )
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        await w.run(stop)
+
+    asyncio.run(run())
+
+class WorkerPool:
+    """
+    Запускає N воркерів поруч із фронт-процесом і зупиняє їх на shutdown.
+    Окремі інтерпретатори (не fork) — воркер не тягне за собою bot.py.
+    Упалий воркер перезапускає respawn_dead() — фронт кличе її періодично.
+    """
+
+    def __init__(self, shards: int, outbox_path: Path):
+        self.shards = shards
+        self.outbox_path = outbox_path
+        self._procs: List[subprocess.Popen] = []
+
+    def _spawn(self, shard: int) -> subprocess.Popen:
+        return subprocess.Popen([sys.executable, __file__, str(shard), str(self.shards), str(self.outbox_path)])
+
+    def start(self) -> None:
+        self._procs = [self._spawn(shard) for shard in range(self.shards)]
+
+    def respawn_dead(self) -> List[Tuple[int, int]]:
+        """Перезапускає воркери, що завершились; → [(шард, код виходу)]."""
+        out = []
+        for shard, p in enumerate(self._procs):
+            code = p.poll()
+            if code is not None:
+                self._procs[shard] = self._spawn(shard)
+                out.append((shard, code))
+        return out
+
+    def alive(self) -> List[bool]:
+        return [p.poll() is None for p in self._procs]
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        for p in self._procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in self._procs:
+            try:
+                p.wait(timeout)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        self._procs.clear()
+
+if __name__ == "__main__":
+    # python workers.py <shard> <shards> <outbox.sqlite3> — можна запускати і окремо
+    from dotenv import load_dotenv
+    load_dotenv()
+    worker_main(int(sys.argv[1]), int(sys.argv[2]), sys.argv[3])